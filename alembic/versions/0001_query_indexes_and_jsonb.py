@@ -0,0 +1,128 @@
+"""Add query indexes and store JSON columns as JSONB
+
+Replaces the single-column user_id indexes with the composite indexes the
+handlers query by, adds the partial index on active price alerts and the
+BRIN indexes on the append-only timestamps, and converts the JSON columns
+to JSONB on PostgreSQL.
+
+Databases created by init_db() already match the models, so every step is
+skipped when the table is missing or already up to date.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-15 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Indexes created with index=True on user_id before this revision
+OLD_USER_INDEXES = {
+    "bookings": "ix_bookings_user_id",
+    "search_history": "ix_search_history_user_id",
+    "price_alerts": "ix_price_alerts_user_id",
+}
+
+# JSON columns stored as JSONB on PostgreSQL
+JSON_COLUMNS = {
+    "bookings": ["booking_data"],
+    "search_history": ["search_params", "results"],
+    "price_alerts": ["search_params"],
+}
+
+ACTIVE_ALERTS = sa.text("status = 'ACTIVE'")
+
+
+def _new_indexes(is_postgresql: bool):
+    """(name, table, columns, options) for every index this revision adds."""
+    indexes = [
+        ("ix_bookings_user_created", "bookings", ["user_id", sa.text("created_at DESC")], {}),
+        (
+            "ix_search_history_user_type_time",
+            "search_history",
+            ["user_id", "search_type", sa.text("searched_at DESC")],
+            {}
+        ),
+        ("ix_price_alerts_user_status", "price_alerts", ["user_id", "status"], {}),
+        (
+            "ix_price_alerts_active_expires",
+            "price_alerts",
+            ["status", "expires_at"],
+            {"postgresql_where": ACTIVE_ALERTS, "sqlite_where": ACTIVE_ALERTS}
+        ),
+    ]
+
+    if is_postgresql:
+        brin = {"postgresql_using": "brin", "postgresql_with": {"pages_per_range": 32}}
+        indexes += [
+            ("ix_bookings_created_brin", "bookings", ["created_at"], brin),
+            ("ix_search_history_searched_brin", "search_history", ["searched_at"], brin),
+        ]
+
+    return indexes
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+    is_postgresql = bind.dialect.name == "postgresql"
+    existing = {
+        table: {index["name"] for index in inspector.get_indexes(table)}
+        for table in OLD_USER_INDEXES
+        if table in tables
+    }
+
+    for table, index_name in OLD_USER_INDEXES.items():
+        if index_name in existing.get(table, ()):
+            op.drop_index(index_name, table_name=table)
+
+    for index_name, table, columns, options in _new_indexes(is_postgresql):
+        if table in existing and index_name not in existing[table]:
+            op.create_index(index_name, table, columns, **options)
+
+    if is_postgresql:
+        for table, columns in JSON_COLUMNS.items():
+            if table not in tables:
+                continue
+            types = {column["name"]: column["type"] for column in inspector.get_columns(table)}
+            for column in columns:
+                if not isinstance(types.get(column), postgresql.JSONB):
+                    op.alter_column(
+                        table,
+                        column,
+                        type_=postgresql.JSONB(),
+                        postgresql_using=f"{column}::jsonb"
+                    )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    is_postgresql = bind.dialect.name == "postgresql"
+
+    if is_postgresql:
+        for table, columns in JSON_COLUMNS.items():
+            for column in columns:
+                op.alter_column(
+                    table,
+                    column,
+                    type_=sa.JSON(),
+                    postgresql_using=f"{column}::json"
+                )
+
+    for index_name, table, _, _ in reversed(_new_indexes(is_postgresql)):
+        op.drop_index(index_name, table_name=table)
+
+    for table, index_name in OLD_USER_INDEXES.items():
+        op.create_index(index_name, table, ["user_id"])
@@ -2,14 +2,17 @@
 
 import logging
 from telegram import Update
-from telegram.ext import ContextTypes, ConversationHandler
-from datetime import datetime, timedelta
+from telegram.ext import ContextTypes, ConversationHandler, MessageHandler, filters
+from datetime import timedelta
+from sqlalchemy import select
+from sqlalchemy.orm import load_only
 
-from utils.i18n import get_text
+from utils.i18n import get_text, get_template
 from utils.validators import validate_number
-from bot.keyboards import get_main_menu_keyboard
-from models import User, PriceAlert, AlertType, AlertStatus
-from config.database import SessionLocal
+from bot.keyboards import get_main_menu_keyboard, DELETE_ALERT_PREFIX
+from bot.utils import get_language, with_user_language
+from models import PriceAlert, AlertType, AlertStatus
+from config.database import AsyncSessionLocal, utcnow
 
 logger = logging.getLogger(__name__)
 
@@ -24,28 +27,41 @@ async def alerts_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     user_id = update.effective_user.id
     
-    db = SessionLocal()
-    try:
-        db_user = db.query(User).filter(User.user_id == user_id).first()
-        language = db_user.language if db_user else "en"
+    async with AsyncSessionLocal() as db:
+        language = await get_language(user_id, db)
         
         # Get user alerts
-        alerts = db.query(PriceAlert).filter(
-            PriceAlert.user_id == user_id,
-            PriceAlert.status == AlertStatus.ACTIVE
-        ).all()
+        alerts = (await db.scalars(
+            select(PriceAlert)
+            # Skip the search_params JSON, the list doesn't show it
+            .options(load_only(
+                PriceAlert.alert_id,
+                PriceAlert.type,
+                PriceAlert.target_price,
+                PriceAlert.status
+            ))
+            .where(
+                PriceAlert.user_id == user_id,
+                PriceAlert.status == AlertStatus.ACTIVE
+            )
+        )).all()
         
-        alerts_text = get_text("alerts.title", user_id=user_id, language=language) + "\n\n"
+        parts = [get_text("alerts.title", user_id=user_id, language=language) + "\n\n"]
         
         if alerts:
+            status_template = get_template("alerts.status", language)
+            
             for alert in alerts:
-                alerts_text += f"🔔 {alert.type.value} Alert\n"
-                alerts_text += f"   Target: {alert.target_price:,.2f} ETB\n"
-                alerts_text += f"   {get_text('alerts.status', user_id=user_id, language=language, status=alert.status.value)}\n\n"
+                parts.append(
+                    f"🔔 {alert.type.value} Alert\n"
+                    f"   Target: {alert.target_price:,.2f} ETB\n"
+                    f"   {status_template.format(status=alert.status.value)}\n\n"
+                )
         else:
-            alerts_text += get_text("alerts.no_alerts", user_id=user_id, language=language) + "\n\n"
+            parts.append(get_text("alerts.no_alerts", user_id=user_id, language=language) + "\n\n")
         
-        alerts_text += get_text("alerts.create_new", user_id=user_id, language=language)
+        parts.append(get_text("alerts.create_new", user_id=user_id, language=language))
+        alerts_text = "".join(parts)
         
         keyboard = get_main_menu_keyboard(user_id=user_id, language=language)
         
@@ -53,30 +69,21 @@ async def alerts_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
             text=alerts_text,
             reply_markup=keyboard
         )
-    
-    finally:
-        db.close()
 
 
-async def create_alert_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@with_user_language
+async def create_alert_start(update: Update, context: ContextTypes.DEFAULT_TYPE, language: str):
     """Start alert creation process."""
     user_id = update.effective_user.id
     
-    db = SessionLocal()
-    try:
-        db_user = db.query(User).filter(User.user_id == user_id).first()
-        language = db_user.language if db_user else "en"
-        
-        text = get_text("alerts.alert_type", user_id=user_id, language=language)
-        await update.message.reply_text(text)
-        
-        return ALERT_TYPE
+    text = get_text("alerts.alert_type", user_id=user_id, language=language)
+    await update.message.reply_text(text)
     
-    finally:
-        db.close()
+    return ALERT_TYPE
 
 
-async def alert_type_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@with_user_language
+async def alert_type_input(update: Update, context: ContextTypes.DEFAULT_TYPE, language: str):
     """Handle alert type input."""
     user_id = update.effective_user.id
     alert_type = update.message.text
@@ -84,30 +91,19 @@ async def alert_type_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Store alert type
     context.user_data['alert_type'] = alert_type
     
-    db = SessionLocal()
-    try:
-        db_user = db.query(User).filter(User.user_id == user_id).first()
-        language = db_user.language if db_user else "en"
-        
-        text = get_text("alerts.target_price", user_id=user_id, language=language)
-        await update.message.reply_text(text)
-        
-        return TARGET_PRICE
+    text = get_text("alerts.target_price", user_id=user_id, language=language)
+    await update.message.reply_text(text)
     
-    finally:
-        db.close()
+    return TARGET_PRICE
 
 
-async def target_price_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@with_user_language
+async def target_price_input(update: Update, context: ContextTypes.DEFAULT_TYPE, language: str):
     """Handle target price input and create alert."""
     user_id = update.effective_user.id
     price_str = update.message.text
     
-    db = SessionLocal()
-    try:
-        db_user = db.query(User).filter(User.user_id == user_id).first()
-        language = db_user.language if db_user else "en"
-        
+    async with AsyncSessionLocal() as db:
         is_valid, price = validate_number(price_str, min_value=1)
         
         if not is_valid:
@@ -123,10 +119,10 @@ async def target_price_input(update: Update, context: ContextTypes.DEFAULT_TYPE)
             target_price=float(price),
             currency="ETB",
             status=AlertStatus.ACTIVE,
-            expires_at=datetime.now() + timedelta(days=30)
+            expires_at=utcnow() + timedelta(days=30)
         )
         db.add(alert)
-        db.commit()
+        await db.commit()
         
         success_text = get_text(
             "alerts.created",
@@ -141,15 +137,13 @@ async def target_price_input(update: Update, context: ContextTypes.DEFAULT_TYPE)
             reply_markup=keyboard
         )
         
-        logger.info(f"Created price alert for user {user_id}")
+        logger.info("Created price alert for user %s", user_id)
         
         return ConversationHandler.END
-    
-    finally:
-        db.close()
 
 
-async def handle_alert_deletion(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@with_user_language
+async def handle_alert_deletion(update: Update, context: ContextTypes.DEFAULT_TYPE, language: str):
     """Handle alert deletion."""
     query = update.callback_query
     await query.answer()
@@ -157,21 +151,19 @@ async def handle_alert_deletion(update: Update, context: ContextTypes.DEFAULT_TY
     user_id = update.effective_user.id
     callback_data = query.data
     
-    alert_id = int(callback_data.split("_")[-1])
+    alert_id = int(callback_data[len(DELETE_ALERT_PREFIX):])
     
-    db = SessionLocal()
-    try:
-        db_user = db.query(User).filter(User.user_id == user_id).first()
-        language = db_user.language if db_user else "en"
-        
-        alert = db.query(PriceAlert).filter(
-            PriceAlert.alert_id == alert_id,
-            PriceAlert.user_id == user_id
-        ).first()
+    async with AsyncSessionLocal() as db:
+        alert = await db.scalar(
+            select(PriceAlert).where(
+                PriceAlert.alert_id == alert_id,
+                PriceAlert.user_id == user_id
+            )
+        )
         
         if alert:
             alert.status = AlertStatus.CANCELLED
-            db.commit()
+            await db.commit()
             
             success_text = get_text("success.saved", user_id=user_id, language=language)
             keyboard = get_main_menu_keyboard(user_id=user_id, language=language)
@@ -181,20 +173,17 @@ async def handle_alert_deletion(update: Update, context: ContextTypes.DEFAULT_TY
                 reply_markup=keyboard
             )
             
-            logger.info(f"Deleted alert {alert_id}")
+            logger.info("Deleted alert %s", alert_id)
         else:
             not_found_text = get_text("errors.not_found", user_id=user_id, language=language)
             await query.edit_message_text(text=not_found_text)
-    
-    finally:
-        db.close()
 
 
 create_alert_conversation = ConversationHandler(
     entry_points=[],
     states={
-        ALERT_TYPE: [lambda u, c: alert_type_input(u, c)],
-        TARGET_PRICE: [lambda u, c: target_price_input(u, c)],
+        ALERT_TYPE: [MessageHandler(filters.TEXT & ~filters.COMMAND, alert_type_input)],
+        TARGET_PRICE: [MessageHandler(filters.TEXT & ~filters.COMMAND, target_price_input)],
     },
     fallbacks=[]
 )
@@ -1,18 +1,37 @@
 """My Bookings handlers."""
 
 import logging
-from telegram import Update, InputFile
+import asyncio
+from telegram import Update
+from telegram.error import BadRequest
 from telegram.ext import ContextTypes
 from io import BytesIO
+from cachetools import LRUCache
+from sqlalchemy import select
+from sqlalchemy.orm import load_only
 
-from utils.i18n import get_text
-from utils.pdf_generator import generate_flight_ticket, generate_hotel_confirmation
-from bot.keyboards import create_booking_list_keyboard, get_main_menu_keyboard
-from models import User, Booking, BookingType
-from config.database import SessionLocal
+from utils.i18n import get_text, get_template
+from utils.pdf_generator import generate_flight_ticket, generate_hotel_confirmation, render_ticket_to_file
+from bot.keyboards import create_booking_list_keyboard, get_main_menu_keyboard, VIEW_BOOKING_PREFIX
+from bot.utils import get_language, with_user_language
+from models import Booking, BookingType
+from config.database import AsyncSessionLocal
 
 logger = logging.getLogger(__name__)
 
+# PDF generator and filename prefix per booking type
+TICKET_GENERATORS = {
+    BookingType.FLIGHT: (generate_flight_ticket, "flight_ticket"),
+    BookingType.HOTEL: (generate_hotel_confirmation, "hotel_confirmation"),
+}
+
+# For tours, use flight ticket template as placeholder
+DEFAULT_TICKET_GENERATOR = (generate_flight_ticket, "booking")
+
+# Telegram file_id of each ticket already uploaded, keyed by reference and
+# payment status, so repeat views are resent without rendering or uploading
+_ticket_file_ids = LRUCache(maxsize=10_000)
+
 
 async def bookings_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle bookings menu callback."""
@@ -21,25 +40,53 @@ async def bookings_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     user_id = update.effective_user.id
     
-    db = SessionLocal()
-    try:
-        db_user = db.query(User).filter(User.user_id == user_id).first()
-        language = db_user.language if db_user else "en"
+    async with AsyncSessionLocal() as db:
+        language = await get_language(user_id, db)
         
         # Get user bookings
-        bookings = db.query(Booking).filter(Booking.user_id == user_id).order_by(Booking.created_at.desc()).all()
+        bookings = (await db.scalars(
+            select(Booking)
+            # Only the listed fields; the booking_data JSON is loaded on view
+            .options(load_only(
+                Booking.booking_id,
+                Booking.booking_reference,
+                Booking.type,
+                Booking.payment_status,
+                Booking.total_price
+            ))
+            .where(Booking.user_id == user_id)
+            .order_by(Booking.created_at.desc())
+            .limit(10)  # Show latest 10
+        )).all()
         
         if bookings:
-            bookings_text = get_text("bookings.title", user_id=user_id, language=language) + "\n\n"
+            parts = [get_text("bookings.title", user_id=user_id, language=language) + "\n\n"]
+            
+            reference_template = get_template("bookings.reference", language)
+            type_template = get_template("bookings.type", language)
+            status_template = get_template("bookings.status", language)
+            total_template = get_template("bookings.total", language)
+            
+            for booking in bookings:
+                parts.append(
+                    f"📌 {reference_template.format(ref=booking.booking_reference)}\n"
+                    f"   {type_template.format(type=booking.type.value)}\n"
+                    f"   {status_template.format(status=booking.payment_status.value)}\n"
+                    f"   {total_template.format(price=f'{booking.total_price:,.2f}')}\n\n"
+                )
             
-            for booking in bookings[:10]:  # Show latest 10
-                bookings_text += f"📌 {get_text('bookings.reference', user_id=user_id, language=language, ref=booking.booking_reference)}\n"
-                bookings_text += f"   {get_text('bookings.type', user_id=user_id, language=language, type=booking.type.value)}\n"
-                bookings_text += f"   {get_text('bookings.status', user_id=user_id, language=language, status=booking.payment_status.value)}\n"
-                bookings_text += f"   {get_text('bookings.total', user_id=user_id, language=language, price=f'{booking.total_price:,.2f}')}\n\n"
+            bookings_text = "".join(parts)
             
+            # The keyboard only needs these fields, skip the full to_dict()
             keyboard = create_booking_list_keyboard(
-                [b.to_dict() for b in bookings],
+                [
+                    {
+                        "booking_id": b.booking_id,
+                        "type": b.type.value,
+                        "booking_reference": b.booking_reference,
+                    }
+                    for b in bookings
+                ],
                 language=language
             )
             
@@ -55,12 +102,10 @@ async def bookings_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 text=no_bookings_text,
                 reply_markup=keyboard
             )
-    
-    finally:
-        db.close()
 
 
-async def handle_booking_view(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@with_user_language
+async def handle_booking_view(update: Update, context: ContextTypes.DEFAULT_TYPE, language: str):
     """Handle viewing booking details and downloading ticket."""
     query = update.callback_query
     await query.answer()
@@ -69,60 +114,70 @@ async def handle_booking_view(update: Update, context: ContextTypes.DEFAULT_TYPE
     callback_data = query.data
     
     # Extract booking ID
-    booking_id = int(callback_data.split("_")[-1])
+    booking_id = int(callback_data[len(VIEW_BOOKING_PREFIX):])
     
-    db = SessionLocal()
-    try:
-        db_user = db.query(User).filter(User.user_id == user_id).first()
-        language = db_user.language if db_user else "en"
-        
+    async with AsyncSessionLocal() as db:
         # Get booking
-        booking = db.query(Booking).filter(
-            Booking.booking_id == booking_id,
-            Booking.user_id == user_id
-        ).first()
+        booking = await db.scalar(
+            select(Booking).where(
+                Booking.booking_id == booking_id,
+                Booking.user_id == user_id
+            )
+        )
+    
+    if booking:
+        # Show booking details
+        details_text = f"📋 {get_text('bookings.title', user_id=user_id, language=language)}\n\n"
+        details_text += f"{get_text('bookings.reference', user_id=user_id, language=language, ref=booking.booking_reference)}\n"
+        details_text += f"{get_text('bookings.type', user_id=user_id, language=language, type=booking.type.value)}\n"
+        details_text += f"{get_text('bookings.status', user_id=user_id, language=language, status=booking.payment_status.value)}\n"
+        details_text += f"{get_text('bookings.total', user_id=user_id, language=language, price=f'{booking.total_price:,.2f}')}\n"
+        
+        generate_pdf, filename_prefix = TICKET_GENERATORS.get(booking.type, DEFAULT_TICKET_GENERATOR)
+        filename = f"{filename_prefix}_{booking.booking_reference}.pdf"
+        ticket_key = (booking.booking_reference, booking.payment_status.value)
+        file_id = _ticket_file_ids.get(ticket_key)
+        
+        # Render the e-ticket/confirmation in a worker thread while the details are sent
+        pdf_task = None
+        if file_id is None:
+            cache_name = f"{booking.booking_reference}_{booking.payment_status.value}.pdf"
+            pdf_task = asyncio.create_task(
+                asyncio.to_thread(render_ticket_to_file, generate_pdf, booking.to_dict(), cache_name)
+            )
         
-        if booking:
-            # Show booking details
-            details_text = f"📋 {get_text('bookings.title', user_id=user_id, language=language)}\n\n"
-            details_text += f"{get_text('bookings.reference', user_id=user_id, language=language, ref=booking.booking_reference)}\n"
-            details_text += f"{get_text('bookings.type', user_id=user_id, language=language, type=booking.type.value)}\n"
-            details_text += f"{get_text('bookings.status', user_id=user_id, language=language, status=booking.payment_status.value)}\n"
-            details_text += f"{get_text('bookings.total', user_id=user_id, language=language, price=f'{booking.total_price:,.2f}')}\n"
+        try:
+            try:
+                await query.edit_message_text(text=details_text)
+            except BadRequest as e:
+                # E.g. "message is not modified" on a repeated tap; the ticket is still wanted
+                logger.warning("Could not show booking details: %s", e)
             
-            await query.edit_message_text(text=details_text)
+            # Reuse the uploaded document if there is one, otherwise upload the cached file
+            document = file_id if file_id is not None else await pdf_task
             
-            # Generate and send e-ticket/confirmation
-            try:
-                if booking.type == BookingType.FLIGHT:
-                    pdf_buffer = generate_flight_ticket(booking.to_dict())
-                    filename = f"flight_ticket_{booking.booking_reference}.pdf"
-                elif booking.type == BookingType.HOTEL:
-                    pdf_buffer = generate_hotel_confirmation(booking.to_dict())
-                    filename = f"hotel_confirmation_{booking.booking_reference}.pdf"
-                else:
-                    # For tours, use flight ticket template as placeholder
-                    pdf_buffer = generate_flight_ticket(booking.to_dict())
-                    filename = f"booking_{booking.booking_reference}.pdf"
-                
-                # Send PDF
-                await context.bot.send_document(
-                    chat_id=user_id,
-                    document=InputFile(pdf_buffer, filename=filename),
-                    caption=get_text("success.ticket_sent", user_id=user_id, language=language)
-                )
-                
-                logger.info(f"Sent e-ticket for booking {booking.booking_reference}")
+            # Send PDF
+            message = await context.bot.send_document(
+                chat_id=user_id,
+                document=document,
+                filename=filename,
+                caption=get_text("success.ticket_sent", user_id=user_id, language=language)
+            )
             
-            except Exception as e:
-                logger.error(f"Error generating e-ticket: {e}")
-                error_text = get_text("errors.generic", user_id=user_id, language=language)
-                await context.bot.send_message(chat_id=user_id, text=error_text)
-        else:
-            not_found_text = get_text("errors.not_found", user_id=user_id, language=language)
-            await query.edit_message_text(text=not_found_text)
-    
-    finally:
-        db.close()
-
-
+            if message.document:
+                _ticket_file_ids[ticket_key] = message.document.file_id
+            
+            logger.info("Sent e-ticket for booking %s", booking.booking_reference)
+        
+        except Exception as e:
+            logger.error("Error generating e-ticket: %s", e)
+            error_text = get_text("errors.generic", user_id=user_id, language=language)
+            await context.bot.send_message(chat_id=user_id, text=error_text)
+        
+        finally:
+            # Don't leave the render running unobserved if the details edit failed
+            if pdf_task is not None and not pdf_task.done():
+                pdf_task.cancel()
+    else:
+        not_found_text = get_text("errors.not_found", user_id=user_id, language=language)
+        await query.edit_message_text(text=not_found_text)
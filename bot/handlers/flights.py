@@ -1,9 +1,9 @@
 """Flight search and booking handlers."""
 
 import logging
+import asyncio
 from telegram import Update
-from telegram.ext import ContextTypes, ConversationHandler
-from datetime import datetime
+from telegram.ext import ContextTypes, ConversationHandler, MessageHandler, filters
 
 from utils.i18n import get_text
 from utils.validators import validate_date, validate_number
@@ -12,11 +12,15 @@ from bot.keyboards import (
     get_international_cities_keyboard,
     create_flight_result_keyboard,
     get_payment_keyboard,
-    get_main_menu_keyboard
+    get_main_menu_keyboard,
+    SELECT_FLIGHT_PREFIX,
+    PAYMENT_PREFIX
 )
+from bot.utils import with_user_language
 from services import TripAPI, CurrencyConverter, PaymentProcessor
-from models import User, SearchHistory, Booking, SearchType, BookingType, PaymentStatus
-from config.database import SessionLocal
+from tasks.search_history import enqueue_search_history
+from models import SearchHistory, Booking, SearchType, BookingType, PaymentStatus
+from config.database import AsyncSessionLocal
 
 logger = logging.getLogger(__name__)
 
@@ -29,37 +33,32 @@ currency_converter = CurrencyConverter()
 payment_processor = PaymentProcessor()
 
 
-async def flights_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@with_user_language
+async def flights_menu(update: Update, context: ContextTypes.DEFAULT_TYPE, language: str):
     """
     Handle flights menu callback.
     
     Args:
         update: Telegram update object
         context: Callback context
+        language: User's language preference
     """
     query = update.callback_query
     await query.answer()
     
     user_id = update.effective_user.id
     
-    db = SessionLocal()
-    try:
-        db_user = db.query(User).filter(User.user_id == user_id).first()
-        language = db_user.language if db_user else "en"
-        
-        text = get_text("flights.search_title", user_id=user_id, language=language) + "\n\n"
-        text += get_text("flights.origin", user_id=user_id, language=language)
-        
-        await query.edit_message_text(text=text)
-        
-        # Start flight search conversation
-        return ORIGIN
+    text = get_text("flights.search_title", user_id=user_id, language=language) + "\n\n"
+    text += get_text("flights.origin", user_id=user_id, language=language)
     
-    finally:
-        db.close()
+    await query.edit_message_text(text=text)
+    
+    # Start flight search conversation
+    return ORIGIN
 
 
-async def flight_origin(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@with_user_language
+async def flight_origin(update: Update, context: ContextTypes.DEFAULT_TYPE, language: str):
     """Handle origin city input."""
     user_id = update.effective_user.id
     origin = update.message.text
@@ -67,21 +66,14 @@ async def flight_origin(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Store origin in context
     context.user_data['flight_origin'] = origin
     
-    db = SessionLocal()
-    try:
-        db_user = db.query(User).filter(User.user_id == user_id).first()
-        language = db_user.language if db_user else "en"
-        
-        text = get_text("flights.destination", user_id=user_id, language=language)
-        await update.message.reply_text(text)
-        
-        return DESTINATION
+    text = get_text("flights.destination", user_id=user_id, language=language)
+    await update.message.reply_text(text)
     
-    finally:
-        db.close()
+    return DESTINATION
 
 
-async def flight_destination(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@with_user_language
+async def flight_destination(update: Update, context: ContextTypes.DEFAULT_TYPE, language: str):
     """Handle destination city input."""
     user_id = update.effective_user.id
     destination = update.message.text
@@ -89,165 +81,149 @@ async def flight_destination(update: Update, context: ContextTypes.DEFAULT_TYPE)
     # Store destination in context
     context.user_data['flight_destination'] = destination
     
-    db = SessionLocal()
-    try:
-        db_user = db.query(User).filter(User.user_id == user_id).first()
-        language = db_user.language if db_user else "en"
-        
-        text = get_text("flights.depart_date", user_id=user_id, language=language)
-        await update.message.reply_text(text)
-        
-        return DEPART_DATE
+    text = get_text("flights.depart_date", user_id=user_id, language=language)
+    await update.message.reply_text(text)
     
-    finally:
-        db.close()
+    return DEPART_DATE
 
 
-async def flight_depart_date(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@with_user_language
+async def flight_depart_date(update: Update, context: ContextTypes.DEFAULT_TYPE, language: str):
     """Handle departure date input."""
     user_id = update.effective_user.id
     date_str = update.message.text
     
-    db = SessionLocal()
-    try:
-        db_user = db.query(User).filter(User.user_id == user_id).first()
-        language = db_user.language if db_user else "en"
-        
-        # Validate date
-        is_valid, date_obj = validate_date(date_str)
-        
-        if not is_valid:
-            error_text = get_text("errors.invalid_date", user_id=user_id, language=language)
-            await update.message.reply_text(error_text)
-            return DEPART_DATE
-        
-        # Store date in context
-        context.user_data['flight_depart_date'] = date_str
-        
-        text = get_text("flights.return_date", user_id=user_id, language=language)
-        await update.message.reply_text(text)
-        
-        return RETURN_DATE
+    # Validate date
+    is_valid, date_obj = validate_date(date_str)
+    
+    if not is_valid:
+        error_text = get_text("errors.invalid_date", user_id=user_id, language=language)
+        await update.message.reply_text(error_text)
+        return DEPART_DATE
     
-    finally:
-        db.close()
+    # Store date in context
+    context.user_data['flight_depart_date'] = date_str
+    context.user_data['flight_depart_date_obj'] = date_obj.date()
+    
+    text = get_text("flights.return_date", user_id=user_id, language=language)
+    await update.message.reply_text(text)
+    
+    return RETURN_DATE
 
 
-async def flight_return_date(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@with_user_language
+async def flight_return_date(update: Update, context: ContextTypes.DEFAULT_TYPE, language: str):
     """Handle return date input."""
     user_id = update.effective_user.id
     date_str = update.message.text
     
-    db = SessionLocal()
-    try:
-        db_user = db.query(User).filter(User.user_id == user_id).first()
-        language = db_user.language if db_user else "en"
-        
-        # Check if user wants one-way
-        if date_str.lower() == 'skip':
-            context.user_data['flight_return_date'] = None
-        else:
-            # Validate date
-            is_valid, date_obj = validate_date(date_str)
-            
-            if not is_valid:
-                error_text = get_text("errors.invalid_date", user_id=user_id, language=language)
-                await update.message.reply_text(error_text)
-                return RETURN_DATE
-            
-            context.user_data['flight_return_date'] = date_str
+    # Check if user wants one-way
+    if date_str.lower() == 'skip':
+        context.user_data['flight_return_date'] = None
+        context.user_data['flight_return_date_obj'] = None
+    else:
+        # Validate date
+        is_valid, date_obj = validate_date(date_str)
         
-        text = get_text("flights.passengers", user_id=user_id, language=language)
-        await update.message.reply_text(text)
+        if not is_valid:
+            error_text = get_text("errors.invalid_date", user_id=user_id, language=language)
+            await update.message.reply_text(error_text)
+            return RETURN_DATE
         
-        return PASSENGERS
+        context.user_data['flight_return_date'] = date_str
+        context.user_data['flight_return_date_obj'] = date_obj.date()
+    
+    text = get_text("flights.passengers", user_id=user_id, language=language)
+    await update.message.reply_text(text)
     
-    finally:
-        db.close()
+    return PASSENGERS
 
 
-async def flight_passengers(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@with_user_language
+async def flight_passengers(update: Update, context: ContextTypes.DEFAULT_TYPE, language: str):
     """Handle passengers count input and perform search."""
     user_id = update.effective_user.id
     passengers_str = update.message.text
     
-    db = SessionLocal()
-    try:
-        db_user = db.query(User).filter(User.user_id == user_id).first()
-        language = db_user.language if db_user else "en"
-        
-        # Validate number
-        is_valid, passengers = validate_number(passengers_str, min_value=1, max_value=9)
-        
-        if not is_valid:
-            error_text = get_text("errors.invalid_number", user_id=user_id, language=language)
-            await update.message.reply_text(error_text)
-            return PASSENGERS
-        
-        # Perform flight search
-        searching_text = get_text("flights.searching", user_id=user_id, language=language)
-        await update.message.reply_text(searching_text)
-        
-        flights = trip_api.search_flights(
+    # Validate number
+    is_valid, passengers = validate_number(passengers_str, min_value=1, max_value=9)
+    
+    if not is_valid:
+        error_text = get_text("errors.invalid_number", user_id=user_id, language=language)
+        await update.message.reply_text(error_text)
+        return PASSENGERS
+    
+    # Perform flight search
+    searching_text = get_text("flights.searching", user_id=user_id, language=language)
+    await update.message.reply_text(searching_text)
+    
+    # Search and exchange rate lookup are independent, run them together
+    flights, rate = await asyncio.gather(
+        trip_api.search_flights(
             from_city=context.user_data['flight_origin'],
             to_city=context.user_data['flight_destination'],
             depart_date=context.user_data['flight_depart_date'],
             return_date=context.user_data.get('flight_return_date'),
             passengers=passengers
-        )
-        
-        # Convert prices to ETB
-        for flight in flights:
-            if 'price_usd' in flight:
-                flight['price'] = currency_converter.convert_usd_to_etb(flight['price_usd'])
-        
-        # Save search history
-        search_history = SearchHistory(
+        ),
+        currency_converter.get_usd_to_etb_rate()
+    )
+    
+    # Convert prices to ETB
+    for flight in flights:
+        if 'price_usd' in flight:
+            flight['price'] = currency_converter.convert_usd_to_etb(flight['price_usd'], rate=rate)
+    
+    # Save search history without holding up the reply
+    search_history = SearchHistory(
+        user_id=user_id,
+        search_type=SearchType.FLIGHT,
+        from_city=context.user_data['flight_origin'],
+        to_city=context.user_data['flight_destination'],
+        depart_date=context.user_data['flight_depart_date_obj'],
+        return_date=context.user_data.get('flight_return_date_obj'),
+        passengers=passengers,
+        search_params={
+            'flight_origin': context.user_data['flight_origin'],
+            'flight_destination': context.user_data['flight_destination'],
+            'flight_depart_date': context.user_data['flight_depart_date'],
+            'flight_return_date': context.user_data.get('flight_return_date'),
+            'passengers': passengers,
+        },
+        results=flights
+    )
+    enqueue_search_history(search_history)
+    
+    # Store flights in context for later selection
+    context.user_data['flight_results'] = flights
+    
+    if flights:
+        results_text = get_text(
+            "flights.results_found",
             user_id=user_id,
-            search_type=SearchType.FLIGHT,
-            from_city=context.user_data['flight_origin'],
-            to_city=context.user_data['flight_destination'],
-            depart_date=datetime.strptime(context.user_data['flight_depart_date'], "%Y-%m-%d").date(),
-            return_date=datetime.strptime(context.user_data['flight_return_date'], "%Y-%m-%d").date() if context.user_data.get('flight_return_date') else None,
-            passengers=passengers,
-            search_params=context.user_data,
-            results=flights
+            language=language,
+            count=len(flights)
         )
-        db.add(search_history)
-        db.commit()
-        
-        # Store flights in context for later selection
-        context.user_data['flight_results'] = flights
+        keyboard = create_flight_result_keyboard(flights, language=language)
         
-        if flights:
-            results_text = get_text(
-                "flights.results_found",
-                user_id=user_id,
-                language=language,
-                count=len(flights)
-            )
-            keyboard = create_flight_result_keyboard(flights, language=language)
-            
-            await update.message.reply_text(
-                results_text,
-                reply_markup=keyboard
-            )
-        else:
-            no_results_text = get_text("flights.no_results", user_id=user_id, language=language)
-            keyboard = get_main_menu_keyboard(user_id=user_id, language=language)
-            
-            await update.message.reply_text(
-                no_results_text,
-                reply_markup=keyboard
-            )
+        await update.message.reply_text(
+            results_text,
+            reply_markup=keyboard
+        )
+    else:
+        no_results_text = get_text("flights.no_results", user_id=user_id, language=language)
+        keyboard = get_main_menu_keyboard(user_id=user_id, language=language)
         
-        return ConversationHandler.END
+        await update.message.reply_text(
+            no_results_text,
+            reply_markup=keyboard
+        )
     
-    finally:
-        db.close()
+    return ConversationHandler.END
 
 
-async def handle_flight_selection(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@with_user_language
+async def handle_flight_selection(update: Update, context: ContextTypes.DEFAULT_TYPE, language: str):
     """Handle flight selection from search results."""
     query = update.callback_query
     await query.answer()
@@ -256,41 +232,37 @@ async def handle_flight_selection(update: Update, context: ContextTypes.DEFAULT_
     callback_data = query.data
     
     # Extract flight index
-    flight_index = int(callback_data.split("_")[-1])
+    flight_index = int(callback_data[len(SELECT_FLIGHT_PREFIX):])
+    
+    # Get selected flight from context
+    flights = context.user_data.get('flight_results', [])
     
-    db = SessionLocal()
-    try:
-        db_user = db.query(User).filter(User.user_id == user_id).first()
-        language = db_user.language if db_user else "en"
+    if flight_index < len(flights):
+        selected_flight = flights[flight_index]
+        context.user_data['selected_flight'] = selected_flight
         
-        # Get selected flight from context
-        flights = context.user_data.get('flight_results', [])
+        # The full result list is no longer needed once a flight is picked
+        context.user_data.pop('flight_results', None)
         
-        if flight_index < len(flights):
-            selected_flight = flights[flight_index]
-            context.user_data['selected_flight'] = selected_flight
-            
-            # Show payment options
-            payment_text = get_text(
-                "payment.total",
-                user_id=user_id,
-                language=language,
-                price=f"{selected_flight.get('price', 0):,.2f}"
-            )
-            payment_text += "\n\n" + get_text("payment.select_method", user_id=user_id, language=language)
-            
-            keyboard = get_payment_keyboard(user_id=user_id, language=language)
-            
-            await query.edit_message_text(
-                text=payment_text,
-                reply_markup=keyboard
-            )
-    
-    finally:
-        db.close()
+        # Show payment options
+        payment_text = get_text(
+            "payment.total",
+            user_id=user_id,
+            language=language,
+            price=f"{selected_flight.get('price', 0):,.2f}"
+        )
+        payment_text += "\n\n" + get_text("payment.select_method", user_id=user_id, language=language)
+        
+        keyboard = get_payment_keyboard(user_id=user_id, language=language)
+        
+        await query.edit_message_text(
+            text=payment_text,
+            reply_markup=keyboard
+        )
 
 
-async def handle_flight_booking(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@with_user_language
+async def handle_flight_booking(update: Update, context: ContextTypes.DEFAULT_TYPE, language: str):
     """Handle flight booking and payment."""
     query = update.callback_query
     await query.answer()
@@ -298,25 +270,26 @@ async def handle_flight_booking(update: Update, context: ContextTypes.DEFAULT_TY
     user_id = update.effective_user.id
     callback_data = query.data
     
-    db = SessionLocal()
-    try:
-        db_user = db.query(User).filter(User.user_id == user_id).first()
-        language = db_user.language if db_user else "en"
-        
-        if callback_data == "payment_cancel":
-            # Cancel booking
-            cancel_text = get_text("buttons.cancel", user_id=user_id, language=language)
-            keyboard = get_main_menu_keyboard(user_id=user_id, language=language)
-            
-            await query.edit_message_text(
-                text=cancel_text,
-                reply_markup=keyboard
-            )
-            return
+    if callback_data == "payment_cancel":
+        # Cancel booking
+        cancel_text = get_text("buttons.cancel", user_id=user_id, language=language)
+        keyboard = get_main_menu_keyboard(user_id=user_id, language=language)
         
+        await query.edit_message_text(
+            text=cancel_text,
+            reply_markup=keyboard
+        )
+        return
+    
+    # Tell the user before opening the session, so no connection or write
+    # transaction is held while waiting on Telegram
+    processing_text = get_text("payment.processing", user_id=user_id, language=language)
+    await query.edit_message_text(text=processing_text)
+    
+    async with AsyncSessionLocal() as db:
         # Get selected flight and payment method
         selected_flight = context.user_data.get('selected_flight', {})
-        payment_method = callback_data.split("_")[1]
+        payment_method = callback_data[len(PAYMENT_PREFIX):]
         
         # Create booking
         import uuid
@@ -334,44 +307,44 @@ async def handle_flight_booking(update: Update, context: ContextTypes.DEFAULT_TY
             currency="ETB"
         )
         db.add(booking)
-        db.commit()
-        
-        # Process payment (mock for now)
-        processing_text = get_text("payment.processing", user_id=user_id, language=language)
-        await query.edit_message_text(text=processing_text)
-        
-        # Simulate payment success
-        booking.payment_status = PaymentStatus.COMPLETED
-        db.commit()
         
-        success_text = get_text(
-            "success.booking_confirmed",
-            user_id=user_id,
-            language=language,
-            ref=booking_reference
-        )
-        keyboard = get_main_menu_keyboard(user_id=user_id, language=language)
-        
-        await query.edit_message_text(
-            text=success_text,
-            reply_markup=keyboard
-        )
-        
-        logger.info(f"Flight booking created: {booking_reference}")
+        try:
+            # Flush to assign the booking ID; the booking and its payment
+            # status are committed together below
+            await db.flush()
+            
+            # Simulate payment success
+            booking.payment_status = PaymentStatus.COMPLETED
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+    
+    success_text = get_text(
+        "success.booking_confirmed",
+        user_id=user_id,
+        language=language,
+        ref=booking_reference
+    )
+    keyboard = get_main_menu_keyboard(user_id=user_id, language=language)
+    
+    await query.edit_message_text(
+        text=success_text,
+        reply_markup=keyboard
+    )
     
-    finally:
-        db.close()
+    logger.info("Flight booking created: %s", booking_reference)
 
 
 # Create conversation handler
 flight_search_conversation = ConversationHandler(
     entry_points=[],
     states={
-        ORIGIN: [lambda u, c: flight_origin(u, c)],
-        DESTINATION: [lambda u, c: flight_destination(u, c)],
-        DEPART_DATE: [lambda u, c: flight_depart_date(u, c)],
-        RETURN_DATE: [lambda u, c: flight_return_date(u, c)],
-        PASSENGERS: [lambda u, c: flight_passengers(u, c)],
+        ORIGIN: [MessageHandler(filters.TEXT & ~filters.COMMAND, flight_origin)],
+        DESTINATION: [MessageHandler(filters.TEXT & ~filters.COMMAND, flight_destination)],
+        DEPART_DATE: [MessageHandler(filters.TEXT & ~filters.COMMAND, flight_depart_date)],
+        RETURN_DATE: [MessageHandler(filters.TEXT & ~filters.COMMAND, flight_return_date)],
+        PASSENGERS: [MessageHandler(filters.TEXT & ~filters.COMMAND, flight_passengers, block=False)],
     },
     fallbacks=[]
 )
@@ -3,11 +3,13 @@
 import logging
 from telegram import Update
 from telegram.ext import ContextTypes, CallbackQueryHandler
+from sqlalchemy import select, update as sql_update
 
 from utils.i18n import get_text, set_user_language
-from bot.keyboards import get_main_menu_keyboard, get_language_keyboard
+from bot.keyboards import get_main_menu_keyboard, get_language_keyboard, LANGUAGE_PREFIX
+from bot.utils import get_language, with_user_language
 from models import User
-from config.database import SessionLocal
+from config.database import AsyncSessionLocal
 
 logger = logging.getLogger(__name__)
 
@@ -24,9 +26,8 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = user.id
     
     # Create or get user from database
-    db = SessionLocal()
-    try:
-        db_user = db.query(User).filter(User.user_id == user_id).first()
+    async with AsyncSessionLocal() as db:
+        db_user = await db.scalar(select(User).where(User.user_id == user_id))
         
         if not db_user:
             # Create new user
@@ -36,41 +37,35 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 language="en"
             )
             db.add(db_user)
-            db.commit()
-            logger.info(f"Created new user: {user_id}")
+            await db.commit()
+            logger.info("Created new user: %s", user_id)
         
         # Set user language in cache
         set_user_language(user_id, db_user.language)
         
         # Send welcome message
-        welcome_text = get_text("welcome", user_id=user_id)
+        welcome_text = get_text("welcome", user_id=user_id, language=db_user.language)
         keyboard = get_main_menu_keyboard(user_id=user_id, language=db_user.language)
         
         await update.message.reply_text(
             welcome_text,
             reply_markup=keyboard
         )
-    
-    finally:
-        db.close()
 
 
-async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@with_user_language
+async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE, language: str):
     """
     Handle /help command.
     
     Args:
         update: Telegram update object
         context: Callback context
+        language: User's language preference
     """
     user_id = update.effective_user.id
     
-    db = SessionLocal()
-    try:
-        db_user = db.query(User).filter(User.user_id == user_id).first()
-        language = db_user.language if db_user else "en"
-        
-        help_text = f"""
+    help_text = f"""
 {get_text('help.title', user_id=user_id, language=language)}
 
 {get_text('help.commands', user_id=user_id, language=language)}
@@ -81,17 +76,14 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 /alerts - Manage price alerts
 
 {get_text('help.contact', user_id=user_id, language=language)}
-        """
-        
-        keyboard = get_main_menu_keyboard(user_id=user_id, language=language)
-        
-        await update.message.reply_text(
-            help_text.strip(),
-            reply_markup=keyboard
-        )
+    """
     
-    finally:
-        db.close()
+    keyboard = get_main_menu_keyboard(user_id=user_id, language=language)
+    
+    await update.message.reply_text(
+        help_text.strip(),
+        reply_markup=keyboard
+    )
 
 
 async def language_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -110,7 +102,8 @@ async def language_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     if callback_data == "menu_language":
         # Show language selection
-        text = get_text("language.title", user_id=user_id)
+        language = await get_language(user_id)
+        text = get_text("language.title", user_id=user_id, language=language)
         keyboard = get_language_keyboard()
         
         await query.edit_message_text(
@@ -118,17 +111,20 @@ async def language_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             reply_markup=keyboard
         )
     
-    elif callback_data.startswith("lang_"):
+    elif callback_data.startswith(LANGUAGE_PREFIX):
         # Set new language
-        new_language = callback_data.split("_")[1]
+        new_language = callback_data[len(LANGUAGE_PREFIX):]
         
-        db = SessionLocal()
-        try:
-            db_user = db.query(User).filter(User.user_id == user_id).first()
+        async with AsyncSessionLocal() as db:
+            # Update the column directly instead of loading the whole user
+            result = await db.execute(
+                sql_update(User)
+                .where(User.user_id == user_id)
+                .values(language=new_language)
+            )
+            await db.commit()
             
-            if db_user:
-                db_user.language = new_language
-                db.commit()
+            if result.rowcount:
                 set_user_language(user_id, new_language)
                 
                 success_text = get_text("language.changed", user_id=user_id, language=new_language)
@@ -139,39 +135,30 @@ async def language_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     reply_markup=keyboard
                 )
                 
-                logger.info(f"User {user_id} changed language to {new_language}")
-        
-        finally:
-            db.close()
+                logger.info("User %s changed language to %s", user_id, new_language)
 
 
-async def main_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@with_user_language
+async def main_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, language: str):
     """
     Handle back to main menu callback.
     
     Args:
         update: Telegram update object
         context: Callback context
+        language: User's language preference
     """
     query = update.callback_query
     await query.answer()
     
     user_id = update.effective_user.id
     
-    db = SessionLocal()
-    try:
-        db_user = db.query(User).filter(User.user_id == user_id).first()
-        language = db_user.language if db_user else "en"
-        
-        welcome_text = get_text("welcome", user_id=user_id, language=language)
-        keyboard = get_main_menu_keyboard(user_id=user_id, language=language)
-        
-        await query.edit_message_text(
-            text=welcome_text,
-            reply_markup=keyboard
-        )
+    welcome_text = get_text("welcome", user_id=user_id, language=language)
+    keyboard = get_main_menu_keyboard(user_id=user_id, language=language)
     
-    finally:
-        db.close()
+    await query.edit_message_text(
+        text=welcome_text,
+        reply_markup=keyboard
+    )
 
 
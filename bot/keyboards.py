@@ -1,9 +1,21 @@
 """Keyboard layouts for the Telegram bot."""
 
+from functools import lru_cache
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
 from typing import List
 from utils.i18n import get_text
 
+# Callback data prefixes for buttons that carry a value
+LANGUAGE_PREFIX = "lang_"
+PAYMENT_PREFIX = "payment_"
+SELECT_FLIGHT_PREFIX = "select_flight_"
+SELECT_HOTEL_PREFIX = "select_hotel_"
+VIEW_BOOKING_PREFIX = "view_booking_"
+DELETE_ALERT_PREFIX = "delete_alert_"
+
+# Trailing back row shared by the result list keyboards
+BACK_ROW = (InlineKeyboardButton("« Back", callback_data="back_to_menu"),)
+
 
 def get_main_menu_keyboard(user_id: int = None, language: str = "en") -> InlineKeyboardMarkup:
     """
@@ -16,40 +28,46 @@ def get_main_menu_keyboard(user_id: int = None, language: str = "en") -> InlineK
     Returns:
         InlineKeyboardMarkup with main menu options
     """
+    return _main_menu_for(language)
+
+
+@lru_cache(maxsize=8)
+def _main_menu_for(language: str) -> InlineKeyboardMarkup:
+    """Build the main menu for a language (shared, markups are immutable)."""
     keyboard = [
         [
             InlineKeyboardButton(
-                get_text("main_menu.flights", user_id=user_id, language=language),
+                get_text("main_menu.flights", language=language),
                 callback_data="menu_flights"
             ),
             InlineKeyboardButton(
-                get_text("main_menu.hotels", user_id=user_id, language=language),
+                get_text("main_menu.hotels", language=language),
                 callback_data="menu_hotels"
             )
         ],
         [
             InlineKeyboardButton(
-                get_text("main_menu.tours", user_id=user_id, language=language),
+                get_text("main_menu.tours", language=language),
                 callback_data="menu_tours"
             ),
             InlineKeyboardButton(
-                get_text("main_menu.bookings", user_id=user_id, language=language),
+                get_text("main_menu.bookings", language=language),
                 callback_data="menu_bookings"
             )
         ],
         [
             InlineKeyboardButton(
-                get_text("main_menu.alerts", user_id=user_id, language=language),
+                get_text("main_menu.alerts", language=language),
                 callback_data="menu_alerts"
             ),
             InlineKeyboardButton(
-                get_text("main_menu.language", user_id=user_id, language=language),
+                get_text("main_menu.language", language=language),
                 callback_data="menu_language"
             )
         ],
         [
             InlineKeyboardButton(
-                get_text("main_menu.help", user_id=user_id, language=language),
+                get_text("main_menu.help", language=language),
                 callback_data="menu_help"
             )
         ]
@@ -66,9 +84,9 @@ def get_language_keyboard() -> InlineKeyboardMarkup:
         InlineKeyboardMarkup with language options
     """
     keyboard = [
-        [InlineKeyboardButton("🇬🇧 English", callback_data="lang_en")],
-        [InlineKeyboardButton("🇪🇹 አማርኛ (Amharic)", callback_data="lang_am")],
-        [InlineKeyboardButton("🇪🇹 Afaan Oromoo (Oromo)", callback_data="lang_om")]
+        [InlineKeyboardButton("🇬🇧 English", callback_data=f"{LANGUAGE_PREFIX}en")],
+        [InlineKeyboardButton("🇪🇹 አማርኛ (Amharic)", callback_data=f"{LANGUAGE_PREFIX}am")],
+        [InlineKeyboardButton("🇪🇹 Afaan Oromoo (Oromo)", callback_data=f"{LANGUAGE_PREFIX}om")]
     ]
     
     return InlineKeyboardMarkup(keyboard)
@@ -85,22 +103,28 @@ def get_payment_keyboard(user_id: int = None, language: str = "en") -> InlineKey
     Returns:
         InlineKeyboardMarkup with payment options
     """
+    return _payment_menu_for(language)
+
+
+@lru_cache(maxsize=8)
+def _payment_menu_for(language: str) -> InlineKeyboardMarkup:
+    """Build the payment method keyboard for a language."""
     keyboard = [
         [
             InlineKeyboardButton(
-                get_text("payment.telebirr", user_id=user_id, language=language),
+                get_text("payment.telebirr", language=language),
                 callback_data="payment_telebirr"
             )
         ],
         [
             InlineKeyboardButton(
-                get_text("payment.cbe", user_id=user_id, language=language),
+                get_text("payment.cbe", language=language),
                 callback_data="payment_cbe"
             )
         ],
         [
             InlineKeyboardButton(
-                get_text("buttons.cancel", user_id=user_id, language=language),
+                get_text("buttons.cancel", language=language),
                 callback_data="payment_cancel"
             )
         ]
@@ -120,10 +144,16 @@ def get_back_button_keyboard(user_id: int = None, language: str = "en") -> Inlin
     Returns:
         InlineKeyboardMarkup with back button
     """
+    return _back_button_for(language)
+
+
+@lru_cache(maxsize=8)
+def _back_button_for(language: str) -> InlineKeyboardMarkup:
+    """Build the back button keyboard for a language."""
     keyboard = [
         [
             InlineKeyboardButton(
-                get_text("buttons.back", user_id=user_id, language=language),
+                get_text("buttons.back", language=language),
                 callback_data="back_to_menu"
             )
         ]
@@ -143,14 +173,20 @@ def get_confirm_cancel_keyboard(user_id: int = None, language: str = "en") -> In
     Returns:
         InlineKeyboardMarkup with confirm and cancel buttons
     """
+    return _confirm_cancel_for(language)
+
+
+@lru_cache(maxsize=8)
+def _confirm_cancel_for(language: str) -> InlineKeyboardMarkup:
+    """Build the confirm/cancel keyboard for a language."""
     keyboard = [
         [
             InlineKeyboardButton(
-                get_text("buttons.confirm", user_id=user_id, language=language),
+                get_text("buttons.confirm", language=language),
                 callback_data="confirm"
             ),
             InlineKeyboardButton(
-                get_text("buttons.cancel", user_id=user_id, language=language),
+                get_text("buttons.cancel", language=language),
                 callback_data="cancel"
             )
         ]
@@ -221,16 +257,11 @@ def create_flight_result_keyboard(flights: List[dict], language: str = "en") ->
         keyboard.append([
             InlineKeyboardButton(
                 button_text,
-                callback_data=f"select_flight_{i}"
+                callback_data=f"{SELECT_FLIGHT_PREFIX}{i}"
             )
         ])
     
-    keyboard.append([
-        InlineKeyboardButton(
-            "« Back",
-            callback_data="back_to_menu"
-        )
-    ])
+    keyboard.append(BACK_ROW)
     
     return InlineKeyboardMarkup(keyboard)
 
@@ -253,16 +284,11 @@ def create_hotel_result_keyboard(hotels: List[dict], language: str = "en") -> In
         keyboard.append([
             InlineKeyboardButton(
                 button_text,
-                callback_data=f"select_hotel_{i}"
+                callback_data=f"{SELECT_HOTEL_PREFIX}{i}"
             )
         ])
     
-    keyboard.append([
-        InlineKeyboardButton(
-            "« Back",
-            callback_data="back_to_menu"
-        )
-    ])
+    keyboard.append(BACK_ROW)
     
     return InlineKeyboardMarkup(keyboard)
 
@@ -285,16 +311,11 @@ def create_booking_list_keyboard(bookings: List[dict], language: str = "en") ->
         keyboard.append([
             InlineKeyboardButton(
                 button_text,
-                callback_data=f"view_booking_{booking.get('booking_id')}"
+                callback_data=f"{VIEW_BOOKING_PREFIX}{booking.get('booking_id')}"
             )
         ])
     
-    keyboard.append([
-        InlineKeyboardButton(
-            "« Back",
-            callback_data="back_to_menu"
-        )
-    ])
+    keyboard.append(BACK_ROW)
     
     return InlineKeyboardMarkup(keyboard)
 
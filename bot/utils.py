@@ -1,17 +1,22 @@
 """Utility functions for bot handlers."""
 
 import logging
+from functools import wraps
 from typing import Optional
 from telegram import Update
 from telegram.ext import ContextTypes
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from models import User
-from config.database import SessionLocal
+from config.database import AsyncSessionLocal
+from utils.i18n import get_cached_language, set_user_language
+from utils.formatting import format_price
 
 logger = logging.getLogger(__name__)
 
 
-def get_user_from_update(update: Update) -> Optional[User]:
+async def get_user_from_update(update: Update) -> Optional[User]:
     """
     Get User object from database based on update.
     
@@ -26,31 +31,56 @@ def get_user_from_update(update: Update) -> Optional[User]:
     
     user_id = update.effective_user.id
     
-    db = SessionLocal()
-    try:
-        user = db.query(User).filter(User.user_id == user_id).first()
-        return user
-    finally:
-        db.close()
+    async with AsyncSessionLocal() as db:
+        return await db.get(User, user_id)
 
 
-def format_price(amount: float, currency: str = "ETB") -> str:
+async def get_language(user_id: int, db: Optional[AsyncSession] = None) -> str:
     """
-    Format price with currency.
+    Get a user's language preference, querying the database only on a cache miss.
     
     Args:
-        amount: Price amount
-        currency: Currency code
+        user_id: Telegram user ID
+        db: Optional open session to reuse for the fallback query
     
     Returns:
-        Formatted price string
+        Language code (defaults to 'en')
     """
-    if currency == "ETB":
-        return f"{amount:,.2f} Birr"
-    elif currency == "USD":
-        return f"${amount:,.2f}"
+    language = get_cached_language(user_id)
+    if language is not None:
+        return language
+    
+    stmt = select(User.language).where(User.user_id == user_id)
+    if db is not None:
+        language = await db.scalar(stmt)
     else:
-        return f"{amount:,.2f} {currency}"
+        async with AsyncSessionLocal() as session:
+            language = await session.scalar(stmt)
+    
+    if language is None:
+        # No user row (yet); don't cache the default over a later /start
+        return "en"
+    
+    set_user_language(user_id, language)
+    return language
+
+
+def with_user_language(handler):
+    """
+    Decorate a handler so it receives the user's language as a keyword argument.
+    
+    Args:
+        handler: Async handler taking (update, context, language)
+    
+    Returns:
+        Handler with the standard (update, context) signature
+    """
+    @wraps(handler)
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs):
+        language = await get_language(update.effective_user.id)
+        return await handler(update, context, *args, language=language, **kwargs)
+    
+    return wrapper
 
 
 def truncate_text(text: str, max_length: int = 100) -> str:
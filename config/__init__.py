@@ -1,8 +1,8 @@
 """Configuration module for Trip Ethiopia Bot."""
 
 from .settings import settings
-from .database import engine, SessionLocal, Base, get_db
+from .database import engine, AsyncSessionLocal, Base, get_db
 
-__all__ = ["settings", "engine", "SessionLocal", "Base", "get_db"]
+__all__ = ["settings", "engine", "AsyncSessionLocal", "Base", "get_db"]
 
 
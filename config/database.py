@@ -1,55 +1,115 @@
 """Database configuration and session management."""
 
-from sqlalchemy import create_engine
+from datetime import datetime, timezone
+from sqlalchemy import JSON, event
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
-from typing import Generator
+from typing import AsyncGenerator
 
 from .settings import settings
 
+# Async drivers used by the bot for each supported backend.
+# Alembic keeps using the synchronous DATABASE_URL as configured.
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def get_async_database_url(database_url: str) -> URL:
+    """
+    Map a database URL onto its asyncio driver.
+    
+    Args:
+        database_url: Database URL (e.g., postgresql://... or sqlite:///...)
+    
+    Returns:
+        URL using the async driver for the same backend
+    """
+    url = make_url(database_url)
+    async_driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    
+    if async_driver and url.drivername != async_driver:
+        url = url.set(drivername=async_driver)
+    
+    return url
+
+
 # Create database engine
 # Handle SQLite vs PostgreSQL connection arguments
-connect_args = {}
-if settings.DATABASE_URL.startswith('sqlite'):
-    connect_args = {"check_same_thread": False}
-    engine = create_engine(
-        settings.DATABASE_URL,
-        connect_args=connect_args,
+async_database_url = get_async_database_url(settings.DATABASE_URL)
+
+if async_database_url.get_backend_name() == "sqlite":
+    engine = create_async_engine(
+        async_database_url,
         echo=settings.DEBUG
     )
+    
+    @event.listens_for(engine.sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        """Use WAL so reads don't block on writes, and fsync less often."""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
 else:
-    engine = create_engine(
-        settings.DATABASE_URL,
+    engine = create_async_engine(
+        async_database_url,
         pool_pre_ping=True,
-        pool_size=10,
-        max_overflow=20,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        # Reuse the most recently returned connection so idle ones can expire
+        pool_use_lifo=True,
         echo=settings.DEBUG
     )
 
 # Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Objects stay loaded after commit so handlers never trigger implicit IO
+AsyncSessionLocal = async_sessionmaker(
+    bind=engine,
+    autoflush=False,
+    expire_on_commit=False
+)
 
 # Create base class for models
 Base = declarative_base()
 
+# JSON column type: binary JSONB on PostgreSQL, plain JSON elsewhere
+JSONDocument = JSON().with_variant(JSONB(), "postgresql")
+
+
+def utcnow() -> datetime:
+    """
+    Current time in UTC, used for model timestamp defaults.
+    
+    Returns:
+        Timezone-aware datetime
+    """
+    return datetime.now(timezone.utc)
+
 
-def get_db() -> Generator[Session, None, None]:
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """
     Dependency function to get database session.
     
     Yields:
-        Session: SQLAlchemy database session
+        AsyncSession: SQLAlchemy async database session
     """
-    db = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
-def init_db():
+async def init_db():
     """Initialize database tables."""
     from models import User, Booking, SearchHistory, PriceAlert
-    Base.metadata.create_all(bind=engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
 
 
+async def close_db():
+    """Dispose of the connection pool."""
+    await engine.dispose()
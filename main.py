@@ -4,6 +4,7 @@ import logging
 import asyncio
 from telegram import Update
 from telegram.ext import (
+    AIORateLimiter,
     Application,
     CommandHandler,
     CallbackQueryHandler,
@@ -12,8 +13,14 @@ from telegram.ext import (
     filters,
 )
 
+try:
+    import uvloop
+except ImportError:  # Optional, and not available on Windows
+    uvloop = None
+
 from config.settings import settings
-from config.database import init_db
+from config.database import init_db, close_db
+from services import close_http_client, close_cache
 from bot.handlers.start import start_command, help_command, language_callback, main_menu_callback
 from bot.handlers.flights import (
     flights_menu, handle_flight_selection, handle_flight_booking,
@@ -29,20 +36,95 @@ from bot.handlers.hotels import (
 from bot.handlers.tours import tours_menu, handle_tour_selection
 from bot.handlers.bookings import bookings_menu, handle_booking_view
 from bot.handlers.alerts import alerts_menu, handle_alert_deletion
+from bot.keyboards import (
+    LANGUAGE_PREFIX, SELECT_FLIGHT_PREFIX, SELECT_HOTEL_PREFIX,
+    VIEW_BOOKING_PREFIX, DELETE_ALERT_PREFIX
+)
 from tasks.price_monitor import run_price_monitor_loop
 from tasks.reminders import run_reminders_loop
+from tasks.search_history import run_search_history_writer, flush_search_history
+from tasks.supervisor import supervise, cancel_tasks
 
 # Configure logging
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=getattr(logging, settings.LOG_LEVEL)
+    level=getattr(logging, settings.LOG_LEVEL),
+    force=True
 )
+# httpx logs every request at INFO
+logging.getLogger("httpx").setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
+# Buttons handled outside the conversations, routed by exact callback data...
+CALLBACK_ROUTES = {
+    "menu_language": language_callback,
+    "back_to_menu": main_menu_callback,
+    # Payment handlers (shared by flight and hotel)
+    "payment_telebirr": handle_flight_booking,
+    "payment_cbe": handle_flight_booking,
+    "payment_cancel": handle_flight_booking,
+    "menu_tours": tours_menu,
+    "menu_bookings": bookings_menu,
+    "menu_alerts": alerts_menu,
+}
+
+# ...or by the prefix in front of the value they carry
+CALLBACK_PREFIX_ROUTES = {
+    LANGUAGE_PREFIX: language_callback,
+    SELECT_FLIGHT_PREFIX: handle_flight_selection,
+    SELECT_HOTEL_PREFIX: handle_hotel_selection,
+    "select_tour_": handle_tour_selection,
+    VIEW_BOOKING_PREFIX: handle_booking_view,
+    DELETE_ALERT_PREFIX: handle_alert_deletion,
+}
+
+# Routed handlers that wait on external APIs or PDF rendering; they run
+# without blocking so one slow chat doesn't hold up updates from others
+NON_BLOCKING_CALLBACKS = {tours_menu, handle_booking_view}
+
+
+def resolve_callback(callback_data: str):
+    """
+    Find the handler for a button press.
+    
+    Args:
+        callback_data: Callback data of the pressed button
+    
+    Returns:
+        Handler coroutine function, or None if no route matches
+    """
+    handler = CALLBACK_ROUTES.get(callback_data)
+    if handler is None:
+        prefix, separator, _ = callback_data.rpartition("_")
+        handler = CALLBACK_PREFIX_ROUTES.get(prefix + separator)
+    return handler
+
+
+def resolve_non_blocking_callback(callback_data: str):
+    """
+    Find the handler for a button press whose handler runs without blocking.
+    
+    Args:
+        callback_data: Callback data of the pressed button
+    
+    Returns:
+        Handler coroutine function, or None if the press is handled in order
+    """
+    handler = resolve_callback(callback_data)
+    return handler if handler in NON_BLOCKING_CALLBACKS else None
+
+
+async def route_callback(update: Update, context):
+    """Dispatch a button press to its handler with dict lookups instead of regex matching."""
+    handler = resolve_callback(update.callback_query.data)
+    return await handler(update, context)
+
 
 async def error_handler(update: Update, context):
     """Handle errors in the bot."""
-    logger.error(f"Update {update} caused error {context.error}")
+    # Log the update ID only; formatting the whole update is expensive
+    update_id = update.update_id if isinstance(update, Update) else None
+    logger.error("Update %s caused error %s", update_id, context.error, exc_info=context.error)
 
 
 def main():
@@ -51,24 +133,31 @@ def main():
     try:
         settings.validate()
     except ValueError as e:
-        logger.error(f"Configuration error: {e}")
+        logger.error("Configuration error: %s", e)
         return
     
-    # Initialize database
-    logger.info("Initializing database...")
-    init_db()
-    
     # Create bot application
     logger.info("Creating bot application...")
-    application = Application.builder().token(settings.TELEGRAM_BOT_TOKEN).build()
+    # Pace outgoing requests to Telegram's flood limits (30 msg/s overall,
+    # 20 msg/min per group) instead of running into RetryAfter.
+    # Updates are processed in order: the conversations below rely on it
+    application = (
+        Application.builder()
+        .token(settings.TELEGRAM_BOT_TOKEN)
+        .rate_limiter(AIORateLimiter())
+        .build()
+    )
     
     # Command handlers
     application.add_handler(CommandHandler("start", start_command))
     application.add_handler(CommandHandler("help", help_command))
     
-    # Callback query handlers
-    application.add_handler(CallbackQueryHandler(language_callback, pattern="^(menu_language|lang_)"))
-    application.add_handler(CallbackQueryHandler(main_menu_callback, pattern="^back_to_menu$"))
+    # Callback query handlers; presses without a route fall through to the
+    # conversation handlers below
+    application.add_handler(
+        CallbackQueryHandler(route_callback, pattern=resolve_non_blocking_callback, block=False)
+    )
+    application.add_handler(CallbackQueryHandler(route_callback, pattern=resolve_callback))
     
     # Flight conversation handler
     flight_conv_handler = ConversationHandler(
@@ -78,12 +167,13 @@ def main():
             DESTINATION: [MessageHandler(filters.TEXT & ~filters.COMMAND, flight_destination)],
             DEPART_DATE: [MessageHandler(filters.TEXT & ~filters.COMMAND, flight_depart_date)],
             RETURN_DATE: [MessageHandler(filters.TEXT & ~filters.COMMAND, flight_return_date)],
-            PASSENGERS: [MessageHandler(filters.TEXT & ~filters.COMMAND, flight_passengers)],
+            # The last step runs the search without blocking other chats;
+            # the conversation waits for it before taking the next update
+            PASSENGERS: [MessageHandler(filters.TEXT & ~filters.COMMAND, flight_passengers, block=False)],
         },
         fallbacks=[CallbackQueryHandler(main_menu_callback, pattern="^back_to_menu$")],
     )
     application.add_handler(flight_conv_handler)
-    application.add_handler(CallbackQueryHandler(handle_flight_selection, pattern="^select_flight_"))
     
     # Hotel conversation handler
     hotel_conv_handler = ConversationHandler(
@@ -93,53 +183,71 @@ def main():
             CHECKIN: [MessageHandler(filters.TEXT & ~filters.COMMAND, hotel_checkin)],
             CHECKOUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, hotel_checkout)],
             ROOMS: [MessageHandler(filters.TEXT & ~filters.COMMAND, hotel_rooms)],
-            GUESTS: [MessageHandler(filters.TEXT & ~filters.COMMAND, hotel_guests)],
+            GUESTS: [MessageHandler(filters.TEXT & ~filters.COMMAND, hotel_guests, block=False)],
         },
         fallbacks=[CallbackQueryHandler(main_menu_callback, pattern="^back_to_menu$")],
     )
     application.add_handler(hotel_conv_handler)
-    application.add_handler(CallbackQueryHandler(handle_hotel_selection, pattern="^select_hotel_"))
-    
-    # Payment handlers (shared by flight and hotel)
-    application.add_handler(CallbackQueryHandler(handle_flight_booking, pattern="^payment_(telebirr|cbe|cancel)$"))
-    
-    # Tour handlers
-    application.add_handler(CallbackQueryHandler(tours_menu, pattern="^menu_tours$"))
-    application.add_handler(CallbackQueryHandler(handle_tour_selection, pattern="^select_tour_"))
-    
-    # Bookings handlers
-    application.add_handler(CallbackQueryHandler(bookings_menu, pattern="^menu_bookings$"))
-    application.add_handler(CallbackQueryHandler(handle_booking_view, pattern="^view_booking_"))
-    
-    # Alerts handlers
-    application.add_handler(CallbackQueryHandler(alerts_menu, pattern="^menu_alerts$"))
-    application.add_handler(CallbackQueryHandler(handle_alert_deletion, pattern="^delete_alert_"))
     
     # Error handler
     application.add_error_handler(error_handler)
     
     # Start background tasks
     async def post_init(app):
-        """Start background tasks after bot initialization."""
+        """Initialize the database and start background tasks after bot initialization."""
+        # Initialize database
+        logger.info("Initializing database...")
+        await init_db()
+        
         logger.info("Starting background tasks...")
         bot = app.bot
         
-        # Start price monitoring
-        asyncio.create_task(run_price_monitor_loop(bot))
-        
-        # Start reminders
-        asyncio.create_task(run_reminders_loop(bot))
+        # Keep references so the tasks aren't garbage collected and can be
+        # cancelled on shutdown; crashed loops are restarted with backoff
+        app.bot_data["bg_tasks"] = [
+            # Price monitoring
+            asyncio.create_task(supervise("price_monitor", run_price_monitor_loop, bot)),
+            # Reminders
+            asyncio.create_task(supervise("reminders", run_reminders_loop, bot)),
+            # Search history writer
+            asyncio.create_task(supervise("search_history", run_search_history_writer)),
+        ]
         
         logger.info("Background tasks started")
     
+    async def post_shutdown(app):
+        """Stop background tasks, flush pending writes and release connections on shutdown."""
+        await cancel_tasks(app.bot_data.get("bg_tasks", []))
+        await flush_search_history()
+        await close_http_client()
+        await close_cache()
+        await close_db()
+    
     application.post_init = post_init
+    application.post_shutdown = post_shutdown
     
     # Start the bot
     logger.info("Starting Trip Ethiopia Bot...")
-    logger.info(f"Environment: {settings.ENVIRONMENT}")
-    logger.info(f"Debug mode: {settings.DEBUG}")
+    logger.info("Environment: %s", settings.ENVIRONMENT)
+    logger.info("Debug mode: %s", settings.DEBUG)
+    
+    # Messages and button presses are the only updates the bot handles
+    allowed_updates = [Update.MESSAGE, Update.CALLBACK_QUERY]
+    
+    if uvloop is not None:
+        uvloop.install()
     
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    if settings.USE_WEBHOOK:
+        logger.info("Receiving updates via webhook at %s", settings.WEBHOOK_URL)
+        application.run_webhook(
+            listen=settings.WEBHOOK_LISTEN,
+            port=settings.WEBHOOK_PORT,
+            webhook_url=settings.WEBHOOK_URL,
+            secret_token=settings.WEBHOOK_SECRET or None,
+            allowed_updates=allowed_updates
+        )
+    else:
+        application.run_polling(allowed_updates=allowed_updates)
 
 
 if __name__ == "__main__":
@@ -1,9 +1,12 @@
 """Price alert model for monitoring price changes."""
 
-from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, JSON, ForeignKey, Enum, func
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, ForeignKey, Enum, Index
+from sqlalchemy.orm import relationship
 import enum
+import hashlib
+import json
 
-from config.database import Base
+from config.database import Base, JSONDocument, utcnow
 
 
 class AlertType(enum.Enum):
@@ -20,29 +23,56 @@ class AlertStatus(enum.Enum):
     EXPIRED = "Expired"
 
 
+# Member values looked up once, for __repr__ and to_dict
+_ALERT_TYPE_VALUES = {member: member.value for member in AlertType}
+_ALERT_STATUS_VALUES = {member: member.value for member in AlertStatus}
+
+
 class PriceAlert(Base):
     """Price alert model for tracking price drop notifications."""
 
     __tablename__ = "price_alerts"
 
     alert_id = Column(Integer, primary_key=True, autoincrement=True)
-    user_id = Column(BigInteger, ForeignKey("users.user_id"), nullable=False, index=True)
+    user_id = Column(BigInteger, ForeignKey("users.user_id"), nullable=False)
     type = Column(Enum(AlertType), nullable=False)
-    search_params = Column(JSON, nullable=False)
+    search_params = Column(JSONDocument, nullable=False)
     target_price = Column(Float, nullable=False)
     current_price = Column(Float, nullable=True)
     currency = Column(String(10), default="ETB")
     status = Column(Enum(AlertStatus), default=AlertStatus.ACTIVE)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), default=utcnow)
     triggered_at = Column(DateTime(timezone=True), nullable=True)
     expires_at = Column(DateTime(timezone=True), nullable=True)
 
+    user = relationship("User")
+
+    __table_args__ = (
+        # Alerts menu: a user's alerts filtered by status
+        Index("ix_price_alerts_user_status", user_id, status),
+        # Price monitor: only active alerts are scanned, by expiry
+        Index(
+            "ix_price_alerts_active_expires",
+            status,
+            expires_at,
+            postgresql_where=(status == AlertStatus.ACTIVE),
+            sqlite_where=(status == AlertStatus.ACTIVE)
+        ),
+    )
+
+    @property
+    def alert_key(self) -> str:
+        """Key shared by alerts that watch the same search."""
+        params = json.dumps(self.search_params or {}, sort_keys=True, default=str)
+        digest = hashlib.md5(params.encode(), usedforsecurity=False).hexdigest()
+        return f"{_ALERT_TYPE_VALUES[self.type]}:{digest}"
+
     def __repr__(self):
         return (
             f"<PriceAlert(alert_id={self.alert_id}, "
             f"user_id={self.user_id}, "
-            f"type={self.type.value}, "
-            f"status={self.status.value})>"
+            f"type={_ALERT_TYPE_VALUES[self.type]}, "
+            f"status={_ALERT_STATUS_VALUES[self.status]})>"
         )
 
     def to_dict(self):
@@ -50,12 +80,12 @@ class PriceAlert(Base):
         return {
             "alert_id": self.alert_id,
             "user_id": self.user_id,
-            "type": self.type.value,
+            "type": _ALERT_TYPE_VALUES[self.type],
             "search_params": self.search_params,
             "target_price": self.target_price,
             "current_price": self.current_price,
             "currency": self.currency,
-            "status": self.status.value,
+            "status": _ALERT_STATUS_VALUES[self.status],
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "triggered_at": self.triggered_at.isoformat() if self.triggered_at else None,
             "expires_at": self.expires_at.isoformat() if self.expires_at else None,
@@ -1,10 +1,10 @@
 """Booking model for storing user bookings."""
 
-from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, Enum, JSON, ForeignKey, func
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, Enum, ForeignKey, Index
 from sqlalchemy.orm import relationship
 import enum
 
-from config.database import Base
+from config.database import Base, JSONDocument, utcnow
 
 
 class BookingType(enum.Enum):
@@ -22,35 +22,55 @@ class PaymentStatus(enum.Enum):
     REFUNDED = "Refunded"
 
 
+# Member values looked up once, for __repr__ and to_dict
+_BOOKING_TYPE_VALUES = {member: member.value for member in BookingType}
+_PAYMENT_STATUS_VALUES = {member: member.value for member in PaymentStatus}
+
+
 class Booking(Base):
     """Booking model representing a user's travel booking."""
 
     __tablename__ = "bookings"
 
     booking_id = Column(Integer, primary_key=True, autoincrement=True)
-    user_id = Column(BigInteger, ForeignKey("users.user_id"), nullable=False, index=True)
+    user_id = Column(BigInteger, ForeignKey("users.user_id"), nullable=False)
     type = Column(Enum(BookingType), nullable=False)
     provider = Column(String(255), nullable=False)
     booking_reference = Column(String(100), unique=True, nullable=True)
-    booking_data = Column(JSON, nullable=False)
+    booking_data = Column(JSONDocument, nullable=False)
     payment_status = Column(Enum(PaymentStatus), default=PaymentStatus.PENDING)
     payment_method = Column(String(50), nullable=True)
     payment_reference = Column(String(100), nullable=True)
     total_price = Column(Float, nullable=False)
     currency = Column(String(10), default="ETB")
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), default=utcnow)
     updated_at = Column(
         DateTime(timezone=True),
-        server_default=func.now(),
-        onupdate=func.now()
+        default=utcnow,
+        onupdate=utcnow
+    )
+
+    user = relationship("User")
+
+    __table_args__ = (
+        # Bookings menu: a user's latest bookings first
+        Index("ix_bookings_user_created", user_id, created_at.desc()),
+        # Time-range scans: rows are append-only, so a BRIN index stays tiny.
+        # PostgreSQL only, SQLite has no BRIN and doesn't need the extra index
+        Index(
+            "ix_bookings_created_brin",
+            created_at,
+            postgresql_using="brin",
+            postgresql_with={"pages_per_range": 32}
+        ).ddl_if(dialect="postgresql"),
     )
 
     def __repr__(self):
         return (
             f"<Booking(booking_id={self.booking_id}, "
             f"user_id={self.user_id}, "
-            f"type={self.type.value}, "
-            f"status={self.payment_status.value})>"
+            f"type={_BOOKING_TYPE_VALUES[self.type]}, "
+            f"status={_PAYMENT_STATUS_VALUES[self.payment_status]})>"
         )
 
     def to_dict(self):
@@ -58,11 +78,11 @@ class Booking(Base):
         return {
             "booking_id": self.booking_id,
             "user_id": self.user_id,
-            "type": self.type.value,
+            "type": _BOOKING_TYPE_VALUES[self.type],
             "provider": self.provider,
             "booking_reference": self.booking_reference,
             "booking_data": self.booking_data,
-            "payment_status": self.payment_status.value,
+            "payment_status": _PAYMENT_STATUS_VALUES[self.payment_status],
             "payment_method": self.payment_method,
             "payment_reference": self.payment_reference,
             "total_price": self.total_price,
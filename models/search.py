@@ -1,9 +1,9 @@
 """Search history model for storing user search queries."""
 
-from sqlalchemy import Column, Integer, BigInteger, String, Date, DateTime, JSON, ForeignKey, Enum, func
+from sqlalchemy import Column, Integer, BigInteger, String, Date, DateTime, ForeignKey, Enum, Index
 import enum
 
-from config.database import Base
+from config.database import Base, JSONDocument, utcnow
 
 
 class SearchType(enum.Enum):
@@ -13,13 +13,17 @@ class SearchType(enum.Enum):
     TOUR = "Tour"
 
 
+# Member values looked up once, for __repr__ and to_dict
+_SEARCH_TYPE_VALUES = {member: member.value for member in SearchType}
+
+
 class SearchHistory(Base):
     """Search history model for tracking user searches."""
 
     __tablename__ = "search_history"
 
     search_id = Column(Integer, primary_key=True, autoincrement=True)
-    user_id = Column(BigInteger, ForeignKey("users.user_id"), nullable=False, index=True)
+    user_id = Column(BigInteger, ForeignKey("users.user_id"), nullable=False)
     search_type = Column(Enum(SearchType), nullable=False)
     from_city = Column(String(100), nullable=True)
     to_city = Column(String(100), nullable=True)
@@ -28,15 +32,27 @@ class SearchHistory(Base):
     passengers = Column(Integer, nullable=True)
     rooms = Column(Integer, nullable=True)
     guests = Column(Integer, nullable=True)
-    search_params = Column(JSON, nullable=False)
-    results = Column(JSON, nullable=True)
-    searched_at = Column(DateTime(timezone=True), server_default=func.now())
+    search_params = Column(JSONDocument, nullable=False)
+    results = Column(JSONDocument, nullable=True)
+    searched_at = Column(DateTime(timezone=True), default=utcnow)
+
+    __table_args__ = (
+        # A user's recent searches of a given type
+        Index("ix_search_history_user_type_time", user_id, search_type, searched_at.desc()),
+        # Time-range scans over the append-only history (PostgreSQL only)
+        Index(
+            "ix_search_history_searched_brin",
+            searched_at,
+            postgresql_using="brin",
+            postgresql_with={"pages_per_range": 32}
+        ).ddl_if(dialect="postgresql"),
+    )
 
     def __repr__(self):
         return (
             f"<SearchHistory(search_id={self.search_id}, "
             f"user_id={self.user_id}, "
-            f"type={self.search_type.value})>"
+            f"type={_SEARCH_TYPE_VALUES[self.search_type]})>"
         )
 
     def to_dict(self):
@@ -44,7 +60,7 @@ class SearchHistory(Base):
         return {
             "search_id": self.search_id,
             "user_id": self.user_id,
-            "search_type": self.search_type.value,
+            "search_type": _SEARCH_TYPE_VALUES[self.search_type],
             "from_city": self.from_city,
             "to_city": self.to_city,
             "depart_date": self.depart_date.isoformat() if self.depart_date else None,
@@ -1,7 +1,7 @@
 """User model for storing Telegram user information."""
 
-from sqlalchemy import Column, BigInteger, String, DateTime, func
-from config.database import Base
+from sqlalchemy import Column, BigInteger, String, DateTime
+from config.database import Base, utcnow
 
 
 class User(Base):
@@ -14,11 +14,11 @@ class User(Base):
     language = Column(String(10), default="en", nullable=False)
     email = Column(String(255), nullable=True)
     phone = Column(String(50), nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), default=utcnow)
     updated_at = Column(
         DateTime(timezone=True),
-        server_default=func.now(),
-        onupdate=func.now()
+        default=utcnow,
+        onupdate=utcnow
     )
 
     def __repr__(self):
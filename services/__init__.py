@@ -4,7 +4,19 @@ from .trip_api import TripAPI
 from .currency import CurrencyConverter
 from .payment import PaymentProcessor
 from .notifications import NotificationService
+from .http import get_http_client, close_http_client
+from .cache import cache_get, cache_set, close_cache
 
-__all__ = ["TripAPI", "CurrencyConverter", "PaymentProcessor", "NotificationService"]
+__all__ = [
+    "TripAPI",
+    "CurrencyConverter",
+    "PaymentProcessor",
+    "NotificationService",
+    "get_http_client",
+    "close_http_client",
+    "cache_get",
+    "cache_set",
+    "close_cache",
+]
 
 
@@ -0,0 +1,75 @@
+"""Shared Redis cache for values that should outlive the process."""
+
+import logging
+from typing import Optional, Union
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# One pooled client for the whole process, created on first use
+_client: Optional[redis.Redis] = None
+
+
+def get_redis() -> redis.Redis:
+    """
+    Get the shared Redis client, creating it on first use.
+    
+    Returns:
+        Pooled redis.asyncio.Redis client
+    """
+    global _client
+    
+    if _client is None:
+        # Short timeouts so a missing Redis never stalls a handler
+        _client = redis.from_url(
+            settings.REDIS_URL,
+            socket_timeout=1,
+            socket_connect_timeout=1
+        )
+    
+    return _client
+
+
+async def cache_get(key: str) -> Optional[bytes]:
+    """
+    Read a value from the cache.
+    
+    Args:
+        key: Cache key
+    
+    Returns:
+        Stored value, or None if missing or Redis is unavailable
+    """
+    try:
+        return await get_redis().get(key)
+    except RedisError as e:
+        logger.warning("Cache read failed for %s: %s", key, e)
+        return None
+
+
+async def cache_set(key: str, value: Union[str, bytes, float], ttl: Optional[int] = None):
+    """
+    Write a value to the cache, ignoring Redis being unavailable.
+    
+    Args:
+        key: Cache key
+        value: Value to store
+        ttl: Optional expiry in seconds
+    """
+    try:
+        await get_redis().set(key, value, ex=ttl)
+    except RedisError as e:
+        logger.warning("Cache write failed for %s: %s", key, e)
+
+
+async def close_cache():
+    """Close the shared Redis client and its connections."""
+    global _client
+    
+    if _client is not None:
+        await _client.aclose()
+        _client = None
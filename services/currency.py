@@ -1,14 +1,29 @@
 """Currency conversion service for USD to ETB."""
 
-import requests
-from typing import Optional
+import asyncio
+import httpx
+from typing import List, Optional
 import logging
 from datetime import datetime, timedelta
 
 from config.settings import settings
+from .http import get_http_client
+from .cache import cache_get, cache_set
+from utils.formatting import format_price
 
 logger = logging.getLogger(__name__)
 
+# Redis key holding the last rate fetched from the API
+RATE_CACHE_KEY = "currency:USD_ETB"
+
+# How long to wait after a failed fetch before calling the API again
+RATE_RETRY_DELAY = timedelta(seconds=60)
+
+# Rate cache and refresh lock shared by every converter instance, so the
+# handlers and background tasks trigger at most one API call between them
+_rate_cache = {}
+_rate_lock = asyncio.Lock()
+
 
 class CurrencyConverter:
     """Service for converting USD to Ethiopian Birr (ETB)."""
@@ -16,11 +31,10 @@ class CurrencyConverter:
     def __init__(self):
         self.api_url = settings.CURRENCY_API_URL
         self.fallback_rate = settings.USD_TO_ETB_RATE
-        self._cache = {}
-        self._cache_timestamp = None
-        self._cache_duration = timedelta(hours=6)  # Cache for 6 hours
+        self._cache = _rate_cache
+        self._cache_duration = timedelta(hours=12)  # Cache for 12 hours
     
-    def get_usd_to_etb_rate(self) -> float:
+    async def get_usd_to_etb_rate(self) -> float:
         """
         Get current USD to ETB exchange rate.
         
@@ -29,11 +43,50 @@ class CurrencyConverter:
         """
         # Check cache
         if self._is_cache_valid():
-            return self._cache.get('USD_ETB', self.fallback_rate)
+            return self._cache['USD_ETB']
+        
+        # A recent fetch failed: serve the stale or fallback rate until the retry time
+        if self._in_retry_backoff():
+            return self.get_cached_rate()
+        
+        async with _rate_lock:
+            # Another task may have refreshed the rate, or failed to, while we waited
+            if self._is_cache_valid():
+                return self._cache['USD_ETB']
+            if self._in_retry_backoff():
+                return self.get_cached_rate()
+            
+            rate = await self._fetch_rate()
+            if rate is not None:
+                self._cache['USD_ETB'] = rate
+                self._cache['timestamp'] = datetime.now()
+                self._cache.pop('retry_after', None)
+                await cache_set(RATE_CACHE_KEY, rate)
+                return rate
+            
+            self._cache['retry_after'] = datetime.now() + RATE_RETRY_DELAY
+            
+            # API unavailable: use the last known rate before the fallback
+            if 'USD_ETB' in self._cache:
+                return self._cache['USD_ETB']
+            
+            stored = await cache_get(RATE_CACHE_KEY)
+            if stored is not None:
+                rate = float(stored)
+                self._cache['USD_ETB'] = rate
+                return rate
+            
+            return self.fallback_rate
+    
+    async def _fetch_rate(self) -> Optional[float]:
+        """
+        Fetch the USD to ETB rate from the currency API.
         
-        # Fetch from API
+        Returns:
+            Exchange rate, or None if the API call failed
+        """
         try:
-            response = requests.get(
+            response = await get_http_client().get(
                 f"{self.api_url}/latest",
                 params={'base': 'USD', 'symbols': 'ETB'},
                 timeout=10
@@ -43,35 +96,58 @@ class CurrencyConverter:
             
             if 'rates' in data and 'ETB' in data['rates']:
                 rate = float(data['rates']['ETB'])
-                
-                # Update cache
-                self._cache['USD_ETB'] = rate
-                self._cache_timestamp = datetime.now()
-                
-                logger.info(f"Updated USD to ETB rate: {rate}")
+                logger.info("Updated USD to ETB rate: %s", rate)
                 return rate
-            else:
-                logger.warning("Currency API response missing rate data")
-                return self.fallback_rate
+            
+            logger.warning("Currency API response missing rate data")
+            return None
         
-        except requests.RequestException as e:
-            logger.error(f"Currency API error: {e}")
-            return self.fallback_rate
+        except (httpx.HTTPError, ValueError) as e:
+            logger.error("Currency API error: %s", e)
+            return None
+    
+    def get_cached_rate(self) -> float:
+        """
+        Get the last fetched USD to ETB rate without any network call.
+        
+        Returns:
+            Cached exchange rate, or the configured fallback rate
+        """
+        return self._cache.get('USD_ETB', self.fallback_rate)
     
-    def convert_usd_to_etb(self, usd_amount: float) -> float:
+    def convert_usd_to_etb(self, usd_amount: float, rate: Optional[float] = None) -> float:
         """
         Convert USD amount to ETB.
         
         Args:
             usd_amount: Amount in USD
+            rate: Optional exchange rate already fetched by the caller,
+                otherwise the last fetched (or fallback) rate is used
         
         Returns:
             Amount in ETB
         """
-        rate = self.get_usd_to_etb_rate()
+        if rate is None:
+            rate = self.get_cached_rate()
         etb_amount = usd_amount * rate
         return round(etb_amount, 2)
     
+    def convert_batch(self, usd_amounts: List[float], rate: Optional[float] = None) -> List[float]:
+        """
+        Convert a list of USD amounts to ETB with a single exchange rate.
+        
+        Args:
+            usd_amounts: Amounts in USD
+            rate: Optional exchange rate already fetched by the caller,
+                otherwise the last fetched (or fallback) rate is used
+        
+        Returns:
+            Amounts in ETB, in the same order
+        """
+        if rate is None:
+            rate = self.get_cached_rate()
+        return [round(amount * rate, 2) for amount in usd_amounts]
+    
     def convert_etb_to_usd(self, etb_amount: float) -> float:
         """
         Convert ETB amount to USD.
@@ -82,7 +158,7 @@ class CurrencyConverter:
         Returns:
             Amount in USD
         """
-        rate = self.get_usd_to_etb_rate()
+        rate = self.get_cached_rate()
         usd_amount = etb_amount / rate
         return round(usd_amount, 2)
     
@@ -93,28 +169,22 @@ class CurrencyConverter:
         Returns:
             True if cache is valid, False otherwise
         """
-        if self._cache_timestamp is None:
+        timestamp = self._cache.get('timestamp')
+        if timestamp is None:
             return False
         
-        age = datetime.now() - self._cache_timestamp
+        age = datetime.now() - timestamp
         return age < self._cache_duration
     
-    def format_price(self, amount: float, currency: str = "ETB") -> str:
+    def _in_retry_backoff(self) -> bool:
         """
-        Format price with currency symbol.
-        
-        Args:
-            amount: Price amount
-            currency: Currency code
+        Check if a recent failed fetch means the API should not be called yet.
         
         Returns:
-            Formatted price string
-        """
-        if currency == "ETB":
-            return f"{amount:,.2f} Birr"
-        elif currency == "USD":
-            return f"${amount:,.2f}"
-        else:
-            return f"{amount:,.2f} {currency}"
-
-
+            True if the retry time has not passed, False otherwise
+        """
+        retry_after = self._cache.get('retry_after')
+        return retry_after is not None and datetime.now() < retry_after
+    
+    # Kept on the class for existing callers
+    format_price = staticmethod(format_price)
@@ -0,0 +1,105 @@
+"""Shared HTTP client for outbound API requests."""
+
+import asyncio
+import random
+import httpx
+from typing import Collection, Optional, Tuple, Type
+
+# One pooled client for the whole process so keep-alive connections
+# (and their TLS sessions) are reused across handler invocations
+_client: Optional[httpx.AsyncClient] = None
+
+# Responses that mean "try again later" rather than a real failure
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+# Backoff before retry n is a random delay up to min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2**n)
+RETRY_BASE_DELAY = 0.2
+RETRY_MAX_DELAY = 2.0
+
+# Payloads are encoded with orjson and sent as raw bytes
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Get the shared HTTP client, creating it on first use.
+    
+    Returns:
+        Pooled httpx.AsyncClient
+    """
+    global _client
+    
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+            timeout=httpx.Timeout(10.0)
+        )
+    
+    return _client
+
+
+async def close_http_client():
+    """Close the shared HTTP client and its connections."""
+    global _client
+    
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _retry_delay(attempt: int, response: Optional[httpx.Response] = None) -> Optional[float]:
+    """
+    Delay before the next attempt: Retry-After if given, else full-jitter backoff.
+    
+    Returns None when the server asks for a longer wait than RETRY_MAX_DELAY,
+    so callers give up instead of holding up the handler (and anyone waiting
+    on it) for minutes.
+    """
+    if response is not None:
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            delay = float(retry_after)
+            return delay if delay <= RETRY_MAX_DELAY else None
+    
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+
+async def request_with_retry(
+    method: str,
+    url: str,
+    retry_on: Tuple[Type[Exception], ...] = (httpx.TransportError,),
+    retry_statuses: Collection[int] = RETRY_STATUSES,
+    attempts: int = 4,
+    **kwargs
+) -> httpx.Response:
+    """
+    Send a request on the shared client, retrying transient failures.
+    
+    Args:
+        method: HTTP method
+        url: Request URL
+        retry_on: Exceptions that trigger a retry
+        retry_statuses: Response status codes that trigger a retry
+        attempts: Maximum number of attempts
+        **kwargs: Passed through to httpx.AsyncClient.request
+    
+    Returns:
+        The last response received
+    """
+    client = get_http_client()
+    
+    for attempt in range(1, attempts + 1):
+        try:
+            response = await client.request(method, url, **kwargs)
+        except retry_on:
+            if attempt == attempts:
+                raise
+            delay = _retry_delay(attempt)
+        else:
+            if response.status_code not in retry_statuses or attempt == attempts:
+                return response
+            delay = _retry_delay(attempt, response)
+            if delay is None:
+                return response
+        
+        await asyncio.sleep(delay)
@@ -1,26 +1,147 @@
 """Notification service for sending alerts and reminders."""
 
 import logging
-from typing import List, Dict, Any
+import asyncio
+from functools import wraps
+from typing import List, Dict, Any, Tuple
 from datetime import datetime, timedelta
 from telegram import Bot
+from telegram.error import RetryAfter, TimedOut
 
 from config.settings import settings
 from utils.i18n import get_text
 
 logger = logging.getLogger(__name__)
 
+# Telegram allows about 30 messages per second across all chats
+MAX_CONCURRENT_SENDS = 30
+# Attempts per message when Telegram asks us to slow down or times out
+SEND_ATTEMPTS = 3
+
+
+def _notification(label: str):
+    """
+    Wrap a send_* method with the shared bot check and error logging.
+    
+    Args:
+        label: Notification name used in log messages
+    """
+    def decorator(send):
+        @wraps(send)
+        async def wrapper(self, user_id: int, *args, **kwargs):
+            if not self.bot:
+                logger.error("Bot instance not set")
+                return
+            
+            try:
+                await send(self, user_id, *args, **kwargs)
+                logger.info("Sent %s to user %s", label, user_id)
+            except Exception as e:
+                logger.error("Error sending %s: %s", label, e)
+        
+        return wrapper
+    
+    return decorator
+
 
 class NotificationService:
     """Service for sending notifications to users."""
     
     def __init__(self, bot: Bot = None):
         self.bot = bot
+        self._send_slots = asyncio.Semaphore(MAX_CONCURRENT_SENDS)
     
     def set_bot(self, bot: Bot):
         """Set the Telegram bot instance."""
         self.bot = bot
     
+    async def _send(self, user_id: int, message: str):
+        """
+        Send a message, retrying when rate limited or timed out.
+        
+        Args:
+            user_id: Telegram user ID
+            message: Message text
+        """
+        async with self._send_slots:
+            for attempt in range(1, SEND_ATTEMPTS + 1):
+                try:
+                    await self.bot.send_message(chat_id=user_id, text=message)
+                    return
+                except RetryAfter as e:
+                    if attempt == SEND_ATTEMPTS:
+                        raise
+                    await asyncio.sleep(e.retry_after)
+                except TimedOut:
+                    if attempt == SEND_ATTEMPTS:
+                        raise
+                    await asyncio.sleep(2 ** attempt)
+    
+    async def send_bulk(self, jobs: List[Tuple[int, str]]) -> int:
+        """
+        Send many messages concurrently, within Telegram's rate limit.
+        
+        Args:
+            jobs: (user_id, message) pairs
+        
+        Returns:
+            Number of messages delivered
+        """
+        if not self.bot:
+            logger.error("Bot instance not set")
+            return 0
+        
+        results = await asyncio.gather(
+            *(self._send(user_id, message) for user_id, message in jobs),
+            return_exceptions=True
+        )
+        
+        delivered = 0
+        for (user_id, _), result in zip(jobs, results):
+            if isinstance(result, Exception):
+                logger.error("Error sending message to user %s: %s", user_id, result)
+            else:
+                delivered += 1
+        
+        return delivered
+    
+    def flight_reminder_message(
+        self,
+        destination: str,
+        hours_before: int,
+        language: str = "en"
+    ) -> str:
+        """Render the flight reminder text."""
+        return get_text(
+            "notifications.flight_reminder",
+            language=language,
+            destination=destination,
+            hours=hours_before
+        )
+    
+    def hotel_reminder_message(
+        self,
+        hotel_name: str,
+        language: str = "en"
+    ) -> str:
+        """Render the hotel check-in reminder text."""
+        return get_text("notifications.hotel_reminder", language=language, hotel=hotel_name)
+    
+    def price_alert_message(
+        self,
+        item_type: str,
+        new_price: float,
+        language: str = "en"
+    ) -> str:
+        """Render the price drop alert text."""
+        return get_text(
+            "notifications.price_drop",
+            language=language,
+            type=item_type,
+            price=f"{new_price:,.2f}"
+        )
+    
+    @_notification("flight reminder")
     async def send_flight_reminder(
         self,
         user_id: int,
@@ -37,29 +158,11 @@ class NotificationService:
             hours_before: Hours before flight
             language: User's language preference
         """
-        if not self.bot:
-            logger.error("Bot instance not set")
-            return
-        
-        try:
-            message = get_text(
-                "notifications.flight_reminder",
-                user_id=user_id,
-                language=language,
-                destination=destination,
-                hours=hours_before
-            )
-            
-            await self.bot.send_message(
-                chat_id=user_id,
-                text=message
-            )
-            
-            logger.info(f"Sent flight reminder to user {user_id}")
+        message = self.flight_reminder_message(destination, hours_before, language)
         
-        except Exception as e:
-            logger.error(f"Error sending flight reminder: {e}")
+        await self._send(user_id, message)
     
+    @_notification("hotel reminder")
     async def send_hotel_reminder(
         self,
         user_id: int,
@@ -74,28 +177,11 @@ class NotificationService:
             hotel_name: Hotel name
             language: User's language preference
         """
-        if not self.bot:
-            logger.error("Bot instance not set")
-            return
-        
-        try:
-            message = get_text(
-                "notifications.hotel_reminder",
-                user_id=user_id,
-                language=language,
-                hotel=hotel_name
-            )
-            
-            await self.bot.send_message(
-                chat_id=user_id,
-                text=message
-            )
-            
-            logger.info(f"Sent hotel reminder to user {user_id}")
+        message = self.hotel_reminder_message(hotel_name, language)
         
-        except Exception as e:
-            logger.error(f"Error sending hotel reminder: {e}")
+        await self._send(user_id, message)
     
+    @_notification("price alert")
     async def send_price_alert(
         self,
         user_id: int,
@@ -112,29 +198,11 @@ class NotificationService:
             new_price: New price in ETB
             language: User's language preference
         """
-        if not self.bot:
-            logger.error("Bot instance not set")
-            return
-        
-        try:
-            message = get_text(
-                "notifications.price_drop",
-                user_id=user_id,
-                language=language,
-                type=item_type,
-                price=f"{new_price:,.2f}"
-            )
-            
-            await self.bot.send_message(
-                chat_id=user_id,
-                text=message
-            )
-            
-            logger.info(f"Sent price alert to user {user_id}")
+        message = self.price_alert_message(item_type, new_price, language)
         
-        except Exception as e:
-            logger.error(f"Error sending price alert: {e}")
+        await self._send(user_id, message)
     
+    @_notification("booking confirmation")
     async def send_booking_confirmation(
         self,
         user_id: int,
@@ -149,28 +217,11 @@ class NotificationService:
             booking_reference: Booking reference number
             language: User's language preference
         """
-        if not self.bot:
-            logger.error("Bot instance not set")
-            return
-        
-        try:
-            message = get_text(
-                "success.booking_confirmed",
-                user_id=user_id,
-                language=language,
-                ref=booking_reference
-            )
-            
-            await self.bot.send_message(
-                chat_id=user_id,
-                text=message
-            )
-            
-            logger.info(f"Sent booking confirmation to user {user_id}")
+        message = get_text("success.booking_confirmed", language=language, ref=booking_reference)
         
-        except Exception as e:
-            logger.error(f"Error sending booking confirmation: {e}")
+        await self._send(user_id, message)
     
+    @_notification("custom message")
     async def send_custom_message(
         self,
         user_id: int,
@@ -183,19 +234,6 @@ class NotificationService:
             user_id: Telegram user ID
             message: Message text
         """
-        if not self.bot:
-            logger.error("Bot instance not set")
-            return
-        
-        try:
-            await self.bot.send_message(
-                chat_id=user_id,
-                text=message
-            )
-            
-            logger.info(f"Sent custom message to user {user_id}")
-        
-        except Exception as e:
-            logger.error(f"Error sending custom message: {e}")
+        await self._send(user_id, message)
 
 
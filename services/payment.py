@@ -1,16 +1,29 @@
 """Payment processing service for TeleBirr and CBE Birr."""
 
-import requests
+import asyncio
+import httpx
 import hashlib
-import json
+import orjson
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 from enum import Enum
 
+from cachetools import TTLCache
+
 from config.settings import settings
+from .http import JSON_HEADERS, request_with_retry
 
 logger = logging.getLogger(__name__)
 
+# Payment initiation is only retried when the request never reached the
+# gateway (or was rejected unprocessed), so a retry can't charge twice
+INITIATE_RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+INITIATE_RETRY_STATUSES = frozenset({429})
+
+# Repeated status polls for a transaction within this many seconds reuse
+# the previous answer
+STATUS_CACHE_TTL = 5
+
 
 class PaymentMethod(Enum):
     """Supported payment methods."""
@@ -27,6 +40,11 @@ class PaymentStatus(Enum):
     CANCELLED = "Cancelled"
 
 
+# Status strings used by the mock gateway responses
+_STATUS_PENDING = PaymentStatus.PENDING.value
+_STATUS_COMPLETED = PaymentStatus.COMPLETED.value
+
+
 class PaymentProcessor:
     """Service for processing payments via Ethiopian payment gateways."""
     
@@ -38,8 +56,37 @@ class PaymentProcessor:
         self.cbe_api_key = settings.CBE_BIRR_API_KEY
         self.cbe_api_secret = settings.CBE_BIRR_API_SECRET
         self.cbe_api_url = settings.CBE_BIRR_API_URL
+        
+        # Secrets encoded once for request signing
+        self._telebirr_secret_bytes = self.telebirr_api_secret.encode()
+        self._cbe_secret_bytes = self.cbe_api_secret.encode()
+        
+        # Gateways without a configured URL use mock responses (development);
+        # the choice is made once here rather than on every call
+        self._initiators = {
+            PaymentMethod.TELEBIRR: (
+                self._initiate_telebirr_payment if self.telebirr_api_url
+                else self._mock_telebirr_payment
+            ),
+            PaymentMethod.CBE_BIRR: (
+                self._initiate_cbe_payment if self.cbe_api_url
+                else self._mock_cbe_payment
+            ),
+        }
+        self._status_cache = TTLCache(maxsize=1024, ttl=STATUS_CACHE_TTL)
+        self._status_checks: Dict[Tuple, asyncio.Future] = {}
+        self._status_checkers = {
+            PaymentMethod.TELEBIRR: (
+                self._check_telebirr_status if self.telebirr_api_url
+                else self._mock_payment_status
+            ),
+            PaymentMethod.CBE_BIRR: (
+                self._check_cbe_status if self.cbe_api_url
+                else self._mock_payment_status
+            ),
+        }
     
-    def initiate_payment(
+    async def initiate_payment(
         self,
         method: PaymentMethod,
         amount: float,
@@ -60,21 +107,16 @@ class PaymentProcessor:
         Returns:
             Payment initiation response
         """
-        if method == PaymentMethod.TELEBIRR:
-            return self._initiate_telebirr_payment(
-                amount, user_id, booking_reference, phone_number
-            )
-        elif method == PaymentMethod.CBE_BIRR:
-            return self._initiate_cbe_payment(
-                amount, user_id, booking_reference
-            )
-        else:
+        initiator = self._initiators.get(method)
+        if initiator is None:
             return {
                 "success": False,
                 "error": "Unsupported payment method"
             }
+        
+        return await initiator(amount, user_id, booking_reference, phone_number)
     
-    def _initiate_telebirr_payment(
+    async def _initiate_telebirr_payment(
         self,
         amount: float,
         user_id: int,
@@ -93,17 +135,6 @@ class PaymentProcessor:
         Returns:
             Payment response
         """
-        if not self.telebirr_api_url:
-            # Mock response for development
-            return {
-                "success": True,
-                "transaction_id": f"TB_{booking_reference}",
-                "payment_url": f"https://telebirr.com/pay?ref={booking_reference}",
-                "qr_code": "mock_qr_code_data",
-                "status": PaymentStatus.PENDING.value,
-                "message": "Please complete payment via TeleBirr app"
-            }
-        
         try:
             payload = {
                 "api_key": self.telebirr_api_key,
@@ -116,29 +147,51 @@ class PaymentProcessor:
             }
             
             # Generate signature
-            payload["signature"] = self._generate_signature(payload, self.telebirr_api_secret)
+            payload["signature"] = self._generate_signature(payload, self._telebirr_secret_bytes)
             
-            response = requests.post(
+            response = await request_with_retry(
+                "POST",
                 f"{self.telebirr_api_url}/payment/initiate",
-                json=payload,
+                retry_on=INITIATE_RETRY_ERRORS,
+                retry_statuses=INITIATE_RETRY_STATUSES,
+                content=orjson.dumps(payload),
+                headers=JSON_HEADERS,
                 timeout=30
             )
             response.raise_for_status()
             
-            return response.json()
+            return orjson.loads(response.content)
         
-        except requests.RequestException as e:
-            logger.error(f"TeleBirr payment initiation error: {e}")
+        except (httpx.HTTPError, ValueError) as e:
+            logger.error("TeleBirr payment initiation error: %s", e)
             return {
                 "success": False,
                 "error": str(e)
             }
     
-    def _initiate_cbe_payment(
+    async def _mock_telebirr_payment(
         self,
         amount: float,
         user_id: int,
-        booking_reference: str
+        booking_reference: str,
+        phone_number: Optional[str]
+    ) -> Dict[str, Any]:
+        """Mock TeleBirr payment initiation for development."""
+        return {
+            "success": True,
+            "transaction_id": f"TB_{booking_reference}",
+            "payment_url": f"https://telebirr.com/pay?ref={booking_reference}",
+            "qr_code": "mock_qr_code_data",
+            "status": _STATUS_PENDING,
+            "message": "Please complete payment via TeleBirr app"
+        }
+    
+    async def _initiate_cbe_payment(
+        self,
+        amount: float,
+        user_id: int,
+        booking_reference: str,
+        phone_number: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Initiate CBE Birr payment.
@@ -147,21 +200,11 @@ class PaymentProcessor:
             amount: Amount in ETB
             user_id: User ID
             booking_reference: Booking reference
+            phone_number: Unused, CBE Birr payments don't need it
         
         Returns:
             Payment response
         """
-        if not self.cbe_api_url:
-            # Mock response for development
-            return {
-                "success": True,
-                "transaction_id": f"CBE_{booking_reference}",
-                "payment_url": f"https://cbebirr.et/pay?ref={booking_reference}",
-                "account_number": "1000123456789",
-                "status": PaymentStatus.PENDING.value,
-                "message": "Please transfer to the provided account"
-            }
-        
         try:
             payload = {
                 "api_key": self.cbe_api_key,
@@ -172,25 +215,46 @@ class PaymentProcessor:
             }
             
             # Generate signature
-            payload["signature"] = self._generate_signature(payload, self.cbe_api_secret)
+            payload["signature"] = self._generate_signature(payload, self._cbe_secret_bytes)
             
-            response = requests.post(
+            response = await request_with_retry(
+                "POST",
                 f"{self.cbe_api_url}/payment/create",
-                json=payload,
+                retry_on=INITIATE_RETRY_ERRORS,
+                retry_statuses=INITIATE_RETRY_STATUSES,
+                content=orjson.dumps(payload),
+                headers=JSON_HEADERS,
                 timeout=30
             )
             response.raise_for_status()
             
-            return response.json()
+            return orjson.loads(response.content)
         
-        except requests.RequestException as e:
-            logger.error(f"CBE Birr payment initiation error: {e}")
+        except (httpx.HTTPError, ValueError) as e:
+            logger.error("CBE Birr payment initiation error: %s", e)
             return {
                 "success": False,
                 "error": str(e)
             }
     
-    def check_payment_status(
+    async def _mock_cbe_payment(
+        self,
+        amount: float,
+        user_id: int,
+        booking_reference: str,
+        phone_number: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Mock CBE Birr payment initiation for development."""
+        return {
+            "success": True,
+            "transaction_id": f"CBE_{booking_reference}",
+            "payment_url": f"https://cbebirr.et/pay?ref={booking_reference}",
+            "account_number": "1000123456789",
+            "status": _STATUS_PENDING,
+            "message": "Please transfer to the provided account"
+        }
+    
+    async def check_payment_status(
         self,
         transaction_id: str,
         method: PaymentMethod
@@ -205,71 +269,83 @@ class PaymentProcessor:
         Returns:
             Payment status information
         """
-        if method == PaymentMethod.TELEBIRR:
-            return self._check_telebirr_status(transaction_id)
-        elif method == PaymentMethod.CBE_BIRR:
-            return self._check_cbe_status(transaction_id)
-        else:
+        status_checker = self._status_checkers.get(method)
+        if status_checker is None:
             return {
                 "success": False,
                 "error": "Unsupported payment method"
             }
+        
+        key = (method, transaction_id)
+        cached = self._status_cache.get(key)
+        if cached is not None:
+            return dict(cached)
+        
+        # Concurrent polls for the same transaction share one gateway call
+        task = self._status_checks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(status_checker(transaction_id))
+            self._status_checks[key] = task
+            task.add_done_callback(lambda _: self._status_checks.pop(key, None))
+        
+        result = await asyncio.shield(task)
+        
+        # Errors aren't cached so the next poll tries the gateway again
+        if result.get("success", True):
+            self._status_cache[key] = result
+        
+        return dict(result)
     
-    def _check_telebirr_status(self, transaction_id: str) -> Dict[str, Any]:
+    async def _check_telebirr_status(self, transaction_id: str) -> Dict[str, Any]:
         """Check TeleBirr payment status."""
-        if not self.telebirr_api_url:
-            # Mock response
-            return {
-                "success": True,
-                "transaction_id": transaction_id,
-                "status": PaymentStatus.COMPLETED.value,
-                "amount": 1000.00
-            }
-        
         try:
-            response = requests.get(
+            # Status checks are idempotent, so any transient failure is retried
+            response = await request_with_retry(
+                "GET",
                 f"{self.telebirr_api_url}/payment/status/{transaction_id}",
                 headers={"Authorization": f"Bearer {self.telebirr_api_key}"},
                 timeout=30
             )
             response.raise_for_status()
-            return response.json()
+            return orjson.loads(response.content)
         
-        except requests.RequestException as e:
-            logger.error(f"TeleBirr status check error: {e}")
+        except (httpx.HTTPError, ValueError) as e:
+            logger.error("TeleBirr status check error: %s", e)
             return {"success": False, "error": str(e)}
     
-    def _check_cbe_status(self, transaction_id: str) -> Dict[str, Any]:
+    async def _check_cbe_status(self, transaction_id: str) -> Dict[str, Any]:
         """Check CBE Birr payment status."""
-        if not self.cbe_api_url:
-            # Mock response
-            return {
-                "success": True,
-                "transaction_id": transaction_id,
-                "status": PaymentStatus.COMPLETED.value,
-                "amount": 1000.00
-            }
-        
         try:
-            response = requests.get(
+            # Status checks are idempotent, so any transient failure is retried
+            response = await request_with_retry(
+                "GET",
                 f"{self.cbe_api_url}/payment/status/{transaction_id}",
                 headers={"Authorization": f"Bearer {self.cbe_api_key}"},
                 timeout=30
             )
             response.raise_for_status()
-            return response.json()
+            return orjson.loads(response.content)
         
-        except requests.RequestException as e:
-            logger.error(f"CBE status check error: {e}")
+        except (httpx.HTTPError, ValueError) as e:
+            logger.error("CBE status check error: %s", e)
             return {"success": False, "error": str(e)}
     
-    def _generate_signature(self, payload: Dict[str, Any], secret: str) -> str:
+    async def _mock_payment_status(self, transaction_id: str) -> Dict[str, Any]:
+        """Mock payment status check for development."""
+        return {
+            "success": True,
+            "transaction_id": transaction_id,
+            "status": _STATUS_COMPLETED,
+            "amount": 1000.00
+        }
+    
+    def _generate_signature(self, payload: Dict[str, Any], secret: bytes) -> str:
         """
         Generate payment signature for authentication.
         
         Args:
             payload: Payment data
-            secret: API secret key
+            secret: Encoded API secret key
         
         Returns:
             Signature string
@@ -277,10 +353,12 @@ class PaymentProcessor:
         # Sort and concatenate payload values
         sorted_items = sorted(payload.items())
         data_string = "".join([str(v) for k, v in sorted_items if k != 'signature'])
-        signature_string = f"{secret}{data_string}{secret}"
         
-        # Generate SHA256 hash
-        signature = hashlib.sha256(signature_string.encode()).hexdigest()
-        return signature
+        # Generate SHA256 hash of secret + data + secret, fed in pieces so the
+        # secret is neither re-encoded nor copied into a joined string
+        digest = hashlib.sha256(secret)
+        digest.update(data_string.encode())
+        digest.update(secret)
+        return digest.hexdigest()
 
 
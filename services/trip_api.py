@@ -1,16 +1,52 @@
 """Trip.com API integration for flights, hotels, and tours."""
 
-import requests
+import asyncio
+import httpx
 import hashlib
+import orjson
+import random
 import time
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 import logging
 
+from cachetools import TLRUCache, TTLCache
+
 from config.settings import settings
+from .http import JSON_HEADERS, get_http_client, request_with_retry
+from .cache import cache_get, cache_set
 
 logger = logging.getLogger(__name__)
 
+# Flight search results are reused for a few minutes; the jitter keeps
+# entries filled at the same moment from expiring together
+FLIGHT_CACHE_SIZE = 1024
+FLIGHT_CACHE_TTL = 300
+FLIGHT_CACHE_JITTER = 60
+
+# Flight search results shared with other processes through Redis
+FLIGHT_REDIS_TTL = 600
+
+# API keys that switch the client to mock data
+TEST_API_KEYS = frozenset({"", "test", "test_key"})
+
+# Hotel and tour inventories change more slowly than flight fares
+HOTEL_CACHE_SIZE = 512
+HOTEL_CACHE_TTL = 1800
+TOUR_CACHE_SIZE = 512
+TOUR_CACHE_TTL = 3600
+
+
+def _redis_key(kind: str, cache_key: Tuple) -> str:
+    """Redis key for a search result, shared by every bot process."""
+    digest = hashlib.sha1(orjson.dumps(cache_key)).hexdigest()
+    return f"trip:{kind}:{digest}"
+
+
+def _flight_cache_ttu(key: Tuple, value: List[Dict[str, Any]], now: float) -> float:
+    """Expiry time for a cached flight search."""
+    return now + FLIGHT_CACHE_TTL + random.uniform(0, FLIGHT_CACHE_JITTER)
+
 
 class TripAPI:
     """Client for Trip.com API integration."""
@@ -19,7 +55,13 @@ class TripAPI:
         self.api_key = settings.TRIP_COM_API_KEY
         self.api_secret = settings.TRIP_COM_API_SECRET
         self.base_url = settings.TRIP_COM_BASE_URL
-        self.session = requests.Session()
+        self.mock_mode = not self.api_key or self.api_key in TEST_API_KEYS
+        self._flight_cache = TLRUCache(maxsize=FLIGHT_CACHE_SIZE, ttu=_flight_cache_ttu)
+        self._flight_cache_hits = 0
+        self._flight_cache_misses = 0
+        self._flight_searches: Dict[Tuple, asyncio.Future] = {}
+        self._hotel_cache = TTLCache(maxsize=HOTEL_CACHE_SIZE, ttl=HOTEL_CACHE_TTL)
+        self._tour_cache = TTLCache(maxsize=TOUR_CACHE_SIZE, ttl=TOUR_CACHE_TTL)
     
     def _generate_signature(self, params: Dict[str, Any]) -> str:
         """
@@ -40,7 +82,7 @@ class TripAPI:
         signature = hashlib.md5(signature_string.encode()).hexdigest().upper()
         return signature
     
-    def _make_request(self, endpoint: str, params: Dict[str, Any], method: str = "GET") -> Dict[str, Any]:
+    async def _make_request(self, endpoint: str, params: Dict[str, Any], method: str = "GET") -> Dict[str, Any]:
         """
         Make API request to Trip.com.
         
@@ -61,18 +103,25 @@ class TripAPI:
         
         try:
             if method == "GET":
-                response = self.session.get(url, params=params, timeout=30)
+                # Lookups are idempotent, so transient failures are retried
+                response = await request_with_retry("GET", url, params=params, timeout=30)
             else:
-                response = self.session.post(url, json=params, timeout=30)
+                # Bookings are not retried, a resend could book twice
+                response = await get_http_client().post(
+                    url,
+                    content=orjson.dumps(params),
+                    headers=JSON_HEADERS,
+                    timeout=30
+                )
             
             response.raise_for_status()
-            return response.json()
+            return orjson.loads(response.content)
         
-        except requests.RequestException as e:
-            logger.error(f"Trip.com API error: {e}")
+        except (httpx.HTTPError, ValueError) as e:
+            logger.error("Trip.com API error: %s", e)
             return {"error": str(e), "success": False}
     
-    def search_flights(
+    async def search_flights(
         self,
         from_city: str,
         to_city: str,
@@ -94,50 +143,73 @@ class TripAPI:
             List of available flights
         """
         # Check if using test API keys - return mock data
-        if not self.api_key or self.api_key == 'test' or self.api_key == 'test_key':
+        if self.mock_mode:
             logger.info("Using mock flight data (test mode)")
-            # Return mock flight results
-            return [
-                {
-                    'flight_id': 'ET001',
-                    'airline': 'Ethiopian Airlines',
-                    'from_city': from_city,
-                    'to_city': to_city,
-                    'departure_time': f'{depart_date}T08:00:00Z',
-                    'arrival_time': f'{depart_date}T12:30:00Z',
-                    'duration': '4h 30m',
-                    'stops': 0,
-                    'flight_number': 'ET-302',
-                    'price_usd': 450.00,
-                    'class': 'Economy'
-                },
-                {
-                    'flight_id': 'KQ002',
-                    'airline': 'Kenya Airways',
-                    'from_city': from_city,
-                    'to_city': to_city,
-                    'departure_time': f'{depart_date}T14:00:00Z',
-                    'arrival_time': f'{depart_date}T18:45:00Z',
-                    'duration': '4h 45m',
-                    'stops': 0,
-                    'flight_number': 'KQ-442',
-                    'price_usd': 380.00,
-                    'class': 'Economy'
-                },
-                {
-                    'flight_id': 'TK003',
-                    'airline': 'Turkish Airlines',
-                    'from_city': from_city,
-                    'to_city': to_city,
-                    'departure_time': f'{depart_date}T22:00:00Z',
-                    'arrival_time': f'{depart_date}T06:30:00Z',
-                    'duration': '8h 30m',
-                    'stops': 1,
-                    'flight_number': 'TK-724',
-                    'price_usd': 520.00,
-                    'class': 'Economy'
-                }
-            ]
+            return self._mock_flights(from_city, to_city, depart_date)
+        
+        # Identical searches from different users share one API call
+        cache_key = (
+            from_city.strip().lower(),
+            to_city.strip().lower(),
+            depart_date.strip(),
+            (return_date or "").strip(),
+            int(passengers)
+        )
+        cached = self._flight_cache.get(cache_key)
+        if cached is not None:
+            self._flight_cache_hits += 1
+            logger.debug(
+                "Flight search cache hit (%s hits, %s misses)",
+                self._flight_cache_hits,
+                self._flight_cache_misses
+            )
+            return [dict(flight) for flight in cached]
+        self._flight_cache_misses += 1
+        
+        # Concurrent identical searches wait on the first one instead of
+        # each calling the API
+        task = self._flight_searches.get(cache_key)
+        if task is None:
+            task = asyncio.ensure_future(
+                self._load_flights(cache_key, from_city, to_city, depart_date, return_date, passengers)
+            )
+            self._flight_searches[cache_key] = task
+            task.add_done_callback(lambda _: self._flight_searches.pop(cache_key, None))
+        
+        flights = await asyncio.shield(task)
+        return [dict(flight) for flight in flights]
+    
+    async def _load_flights(
+        self,
+        cache_key: Tuple,
+        from_city: str,
+        to_city: str,
+        depart_date: str,
+        return_date: Optional[str],
+        passengers: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Load flight search results from Redis, or from the API on a miss.
+        
+        Args:
+            cache_key: Normalized search parameters
+            from_city: Origin city/airport code
+            to_city: Destination city/airport code
+            depart_date: Departure date (YYYY-MM-DD)
+            return_date: Return date for round-trip (YYYY-MM-DD)
+            passengers: Number of passengers
+        
+        Returns:
+            List of available flights
+        """
+        # Results are shared through Redis so they survive restarts
+        redis_key = _redis_key("flight", cache_key)
+        
+        stored = await cache_get(redis_key)
+        if stored is not None:
+            flights = orjson.loads(stored)
+            self._flight_cache[cache_key] = flights
+            return flights
         
         params = {
             'from_city': from_city,
@@ -150,18 +222,74 @@ class TripAPI:
             params['return_date'] = return_date
         
         # Try real API call
-        response = self._make_request('flights/search', params)
+        response = await self._make_request('flights/search', params)
         
         # If error, return mock data
         if 'error' in response:
             logger.warning("API error, returning mock data")
-            return self.search_flights(from_city, to_city, depart_date, return_date, passengers)
+            return self._mock_flights(from_city, to_city, depart_date)
         
         # Parse and return flights
         flights = response.get('data', {}).get('flights', [])
+        self._flight_cache[cache_key] = flights
+        await cache_set(redis_key, orjson.dumps(flights), ttl=FLIGHT_REDIS_TTL)
         return flights
     
-    def search_hotels(
+    def _mock_flights(self, from_city: str, to_city: str, depart_date: str) -> List[Dict[str, Any]]:
+        """
+        Build mock flight results for test mode and API failures.
+        
+        Args:
+            from_city: Origin city/airport code
+            to_city: Destination city/airport code
+            depart_date: Departure date (YYYY-MM-DD)
+        
+        Returns:
+            List of mock flights
+        """
+        return [
+            {
+                'flight_id': 'ET001',
+                'airline': 'Ethiopian Airlines',
+                'from_city': from_city,
+                'to_city': to_city,
+                'departure_time': f'{depart_date}T08:00:00Z',
+                'arrival_time': f'{depart_date}T12:30:00Z',
+                'duration': '4h 30m',
+                'stops': 0,
+                'flight_number': 'ET-302',
+                'price_usd': 450.00,
+                'class': 'Economy'
+            },
+            {
+                'flight_id': 'KQ002',
+                'airline': 'Kenya Airways',
+                'from_city': from_city,
+                'to_city': to_city,
+                'departure_time': f'{depart_date}T14:00:00Z',
+                'arrival_time': f'{depart_date}T18:45:00Z',
+                'duration': '4h 45m',
+                'stops': 0,
+                'flight_number': 'KQ-442',
+                'price_usd': 380.00,
+                'class': 'Economy'
+            },
+            {
+                'flight_id': 'TK003',
+                'airline': 'Turkish Airlines',
+                'from_city': from_city,
+                'to_city': to_city,
+                'departure_time': f'{depart_date}T22:00:00Z',
+                'arrival_time': f'{depart_date}T06:30:00Z',
+                'duration': '8h 30m',
+                'stops': 1,
+                'flight_number': 'TK-724',
+                'price_usd': 520.00,
+                'class': 'Economy'
+            }
+        ]
+    
+    async def search_hotels(
         self,
         city: str,
         checkin_date: str,
@@ -183,59 +311,28 @@ class TripAPI:
             List of available hotels
         """
         # Check if using test API keys - return mock data
-        if not self.api_key or self.api_key == 'test' or self.api_key == 'test_key':
+        if self.mock_mode:
             logger.info("Using mock hotel data (test mode)")
-            # Return mock hotel results
-            return [
-                {
-                    'hotel_id': 'H001',
-                    'name': 'Skylight Hotel ' + city,
-                    'address': 'Main Street, ' + city,
-                    'city': city,
-                    'rating': 4.5,
-                    'checkin_date': checkin_date,
-                    'checkout_date': checkout_date,
-                    'room_type': 'Deluxe Room',
-                    'price_usd': 120.00,
-                    'amenities': 'WiFi, Breakfast, Pool'
-                },
-                {
-                    'hotel_id': 'H002',
-                    'name': 'Grand Palace Hotel',
-                    'address': 'City Center, ' + city,
-                    'city': city,
-                    'rating': 5.0,
-                    'checkin_date': checkin_date,
-                    'checkout_date': checkout_date,
-                    'room_type': 'Executive Suite',
-                    'price_usd': 250.00,
-                    'amenities': 'WiFi, Breakfast, Pool, Spa, Gym'
-                },
-                {
-                    'hotel_id': 'H003',
-                    'name': 'Budget Inn ' + city,
-                    'address': 'Airport Road, ' + city,
-                    'city': city,
-                    'rating': 3.5,
-                    'checkin_date': checkin_date,
-                    'checkout_date': checkout_date,
-                    'room_type': 'Standard Room',
-                    'price_usd': 65.00,
-                    'amenities': 'WiFi, Breakfast'
-                },
-                {
-                    'hotel_id': 'H004',
-                    'name': 'Hilltop Resort',
-                    'address': 'Mountain View, ' + city,
-                    'city': city,
-                    'rating': 4.8,
-                    'checkin_date': checkin_date,
-                    'checkout_date': checkout_date,
-                    'room_type': 'Villa',
-                    'price_usd': 350.00,
-                    'amenities': 'WiFi, Breakfast, Pool, Spa, Gym, Restaurant'
-                }
-            ]
+            return self._mock_hotels(city, checkin_date, checkout_date)
+        
+        cache_key = (
+            city.strip().lower(),
+            checkin_date.strip(),
+            checkout_date.strip(),
+            int(rooms),
+            int(guests)
+        )
+        cached = self._hotel_cache.get(cache_key)
+        if cached is not None:
+            return [dict(hotel) for hotel in cached]
+        
+        # Results are shared through Redis so they survive restarts
+        redis_key = _redis_key("hotel", cache_key)
+        stored = await cache_get(redis_key)
+        if stored is not None:
+            hotels = orjson.loads(stored)
+            self._hotel_cache[cache_key] = hotels
+            return [dict(hotel) for hotel in hotels]
         
         params = {
             'city': city,
@@ -245,16 +342,82 @@ class TripAPI:
             'guests': guests
         }
         
-        response = self._make_request('hotels/search', params)
+        response = await self._make_request('hotels/search', params)
         
+        # Failures aren't cached so the next search tries the API again
         if 'error' in response:
             logger.warning("API error, returning mock data")
-            return self.search_hotels(city, checkin_date, checkout_date, rooms, guests)
+            return self._mock_hotels(city, checkin_date, checkout_date)
         
         hotels = response.get('data', {}).get('hotels', [])
-        return hotels
+        self._hotel_cache[cache_key] = hotels
+        await cache_set(redis_key, orjson.dumps(hotels), ttl=HOTEL_CACHE_TTL)
+        return [dict(hotel) for hotel in hotels]
     
-    def search_tours(
+    def _mock_hotels(self, city: str, checkin_date: str, checkout_date: str) -> List[Dict[str, Any]]:
+        """
+        Build mock hotel results for test mode and API failures.
+        
+        Args:
+            city: City name
+            checkin_date: Check-in date (YYYY-MM-DD)
+            checkout_date: Check-out date (YYYY-MM-DD)
+        
+        Returns:
+            List of mock hotels
+        """
+        return [
+            {
+                'hotel_id': 'H001',
+                'name': 'Skylight Hotel ' + city,
+                'address': 'Main Street, ' + city,
+                'city': city,
+                'rating': 4.5,
+                'checkin_date': checkin_date,
+                'checkout_date': checkout_date,
+                'room_type': 'Deluxe Room',
+                'price_usd': 120.00,
+                'amenities': 'WiFi, Breakfast, Pool'
+            },
+            {
+                'hotel_id': 'H002',
+                'name': 'Grand Palace Hotel',
+                'address': 'City Center, ' + city,
+                'city': city,
+                'rating': 5.0,
+                'checkin_date': checkin_date,
+                'checkout_date': checkout_date,
+                'room_type': 'Executive Suite',
+                'price_usd': 250.00,
+                'amenities': 'WiFi, Breakfast, Pool, Spa, Gym'
+            },
+            {
+                'hotel_id': 'H003',
+                'name': 'Budget Inn ' + city,
+                'address': 'Airport Road, ' + city,
+                'city': city,
+                'rating': 3.5,
+                'checkin_date': checkin_date,
+                'checkout_date': checkout_date,
+                'room_type': 'Standard Room',
+                'price_usd': 65.00,
+                'amenities': 'WiFi, Breakfast'
+            },
+            {
+                'hotel_id': 'H004',
+                'name': 'Hilltop Resort',
+                'address': 'Mountain View, ' + city,
+                'city': city,
+                'rating': 4.8,
+                'checkin_date': checkin_date,
+                'checkout_date': checkout_date,
+                'room_type': 'Villa',
+                'price_usd': 350.00,
+                'amenities': 'WiFi, Breakfast, Pool, Spa, Gym, Restaurant'
+            }
+        ]
+    
+    async def search_tours(
         self,
         destination: Optional[str] = None,
         category: Optional[str] = None
@@ -270,61 +433,21 @@ class TripAPI:
             List of available tours
         """
         # Check if using test API keys - return mock data
-        if not self.api_key or self.api_key == 'test' or self.api_key == 'test_key':
+        if self.mock_mode:
             logger.info("Using mock tour data (test mode)")
-            # Return mock tour results
-            return [
-                {
-                    'tour_id': 'T001',
-                    'name': 'Historic Route of Ethiopia',
-                    'destination': 'Ethiopia',
-                    'category': 'Cultural',
-                    'duration_days': 8,
-                    'description': 'Visit Lalibela, Axum, Gondar and Bahir Dar',
-                    'price_usd': 1200.00,
-                    'includes': 'Accommodation, Transport, Guide, Meals'
-                },
-                {
-                    'tour_id': 'T002',
-                    'name': 'Simien Mountains Trek',
-                    'destination': 'Ethiopia',
-                    'category': 'Adventure',
-                    'duration_days': 5,
-                    'description': 'Trekking in UNESCO World Heritage Site',
-                    'price_usd': 850.00,
-                    'includes': 'Camping, Guide, Meals, Transport'
-                },
-                {
-                    'tour_id': 'T003',
-                    'name': 'Omo Valley Cultural Tour',
-                    'destination': 'Ethiopia',
-                    'category': 'Cultural',
-                    'duration_days': 7,
-                    'description': 'Explore traditional tribes and cultures',
-                    'price_usd': 1100.00,
-                    'includes': 'Accommodation, Guide, Transport, Permits'
-                },
-                {
-                    'tour_id': 'T004',
-                    'name': 'Danakil Depression Adventure',
-                    'destination': 'Ethiopia',
-                    'category': 'Adventure',
-                    'duration_days': 4,
-                    'description': 'Visit one of the hottest places on Earth',
-                    'price_usd': 950.00,
-                    'includes': 'Camping, Guide, Transport, Meals'
-                },
-                {
-                    'tour_id': 'T005',
-                    'name': 'East African Safari',
-                    'destination': 'Kenya & Tanzania',
-                    'category': 'Wildlife',
-                    'duration_days': 10,
-                    'description': 'Serengeti, Masai Mara, and Ngorongoro Crater',
-                    'price_usd': 2500.00,
-                    'includes': 'Accommodation, Transport, Guide, Meals, Park Fees'
-                }
-            ]
+            return self._mock_tours()
+        
+        cache_key = ((destination or "").strip().lower(), (category or "").strip().lower())
+        cached = self._tour_cache.get(cache_key)
+        if cached is not None:
+            return [dict(tour) for tour in cached]
+        
+        redis_key = _redis_key("tour", cache_key)
+        stored = await cache_get(redis_key)
+        if stored is not None:
+            tours = orjson.loads(stored)
+            self._tour_cache[cache_key] = tours
+            return [dict(tour) for tour in tours]
         
         params = {}
         
@@ -333,16 +456,79 @@ class TripAPI:
         if category:
             params['category'] = category
         
-        response = self._make_request('tours/search', params)
+        response = await self._make_request('tours/search', params)
         
+        # Failures aren't cached so the next search tries the API again
         if 'error' in response:
             logger.warning("API error, returning mock data")
-            return self.search_tours(destination, category)
+            return self._mock_tours()
         
         tours = response.get('data', {}).get('tours', [])
-        return tours
+        self._tour_cache[cache_key] = tours
+        await cache_set(redis_key, orjson.dumps(tours), ttl=TOUR_CACHE_TTL)
+        return [dict(tour) for tour in tours]
+    
+    def _mock_tours(self) -> List[Dict[str, Any]]:
+        """
+        Build mock tour results for test mode and API failures.
+        
+        Returns:
+            List of mock tours
+        """
+        return [
+            {
+                'tour_id': 'T001',
+                'name': 'Historic Route of Ethiopia',
+                'destination': 'Ethiopia',
+                'category': 'Cultural',
+                'duration_days': 8,
+                'description': 'Visit Lalibela, Axum, Gondar and Bahir Dar',
+                'price_usd': 1200.00,
+                'includes': 'Accommodation, Transport, Guide, Meals'
+            },
+            {
+                'tour_id': 'T002',
+                'name': 'Simien Mountains Trek',
+                'destination': 'Ethiopia',
+                'category': 'Adventure',
+                'duration_days': 5,
+                'description': 'Trekking in UNESCO World Heritage Site',
+                'price_usd': 850.00,
+                'includes': 'Camping, Guide, Meals, Transport'
+            },
+            {
+                'tour_id': 'T003',
+                'name': 'Omo Valley Cultural Tour',
+                'destination': 'Ethiopia',
+                'category': 'Cultural',
+                'duration_days': 7,
+                'description': 'Explore traditional tribes and cultures',
+                'price_usd': 1100.00,
+                'includes': 'Accommodation, Guide, Transport, Permits'
+            },
+            {
+                'tour_id': 'T004',
+                'name': 'Danakil Depression Adventure',
+                'destination': 'Ethiopia',
+                'category': 'Adventure',
+                'duration_days': 4,
+                'description': 'Visit one of the hottest places on Earth',
+                'price_usd': 950.00,
+                'includes': 'Camping, Guide, Transport, Meals'
+            },
+            {
+                'tour_id': 'T005',
+                'name': 'East African Safari',
+                'destination': 'Kenya & Tanzania',
+                'category': 'Wildlife',
+                'duration_days': 10,
+                'description': 'Serengeti, Masai Mara, and Ngorongoro Crater',
+                'price_usd': 2500.00,
+                'includes': 'Accommodation, Transport, Guide, Meals, Park Fees'
+            }
+        ]
     
-    def get_flight_details(self, flight_id: str) -> Optional[Dict[str, Any]]:
+    async def get_flight_details(self, flight_id: str) -> Optional[Dict[str, Any]]:
         """
         Get detailed information about a specific flight.
         
@@ -353,14 +539,14 @@ class TripAPI:
             Flight details or None
         """
         params = {'flight_id': flight_id}
-        response = self._make_request('flights/details', params)
+        response = await self._make_request('flights/details', params)
         
         if 'error' in response:
             return None
         
         return response.get('data', {})
     
-    def get_hotel_details(self, hotel_id: str) -> Optional[Dict[str, Any]]:
+    async def get_hotel_details(self, hotel_id: str) -> Optional[Dict[str, Any]]:
         """
         Get detailed information about a specific hotel.
         
@@ -371,14 +557,14 @@ class TripAPI:
             Hotel details or None
         """
         params = {'hotel_id': hotel_id}
-        response = self._make_request('hotels/details', params)
+        response = await self._make_request('hotels/details', params)
         
         if 'error' in response:
             return None
         
         return response.get('data', {})
     
-    def create_flight_booking(self, booking_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def create_flight_booking(self, booking_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Create a flight booking.
         
@@ -388,10 +574,10 @@ class TripAPI:
         Returns:
             Booking confirmation
         """
-        response = self._make_request('flights/book', booking_data, method="POST")
+        response = await self._make_request('flights/book', booking_data, method="POST")
         return response
     
-    def create_hotel_booking(self, booking_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def create_hotel_booking(self, booking_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Create a hotel booking.
         
@@ -401,10 +587,10 @@ class TripAPI:
         Returns:
             Booking confirmation
         """
-        response = self._make_request('hotels/book', booking_data, method="POST")
+        response = await self._make_request('hotels/book', booking_data, method="POST")
         return response
     
-    def create_tour_booking(self, booking_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def create_tour_booking(self, booking_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Create a tour booking.
         
@@ -414,7 +600,7 @@ class TripAPI:
         Returns:
             Booking confirmation
         """
-        response = self._make_request('tours/book', booking_data, method="POST")
+        response = await self._make_request('tours/book', booking_data, method="POST")
         return response
 
 
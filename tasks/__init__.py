@@ -2,7 +2,8 @@
 
 from .price_monitor import monitor_prices
 from .reminders import send_reminders
+from .search_history import enqueue_search_history
 
-__all__ = ["monitor_prices", "send_reminders"]
+__all__ = ["monitor_prices", "send_reminders", "enqueue_search_history"]
 
 
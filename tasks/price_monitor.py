@@ -2,11 +2,15 @@
 
 import logging
 import asyncio
-from datetime import datetime
+from itertools import groupby
+from operator import attrgetter
+from typing import Optional
+from sqlalchemy import select, update
+from sqlalchemy.orm import joinedload
 
 from models import PriceAlert, AlertType, AlertStatus, User
 from services import TripAPI, CurrencyConverter, NotificationService
-from config.database import SessionLocal
+from config.database import AsyncSessionLocal, utcnow
 from config.settings import settings
 
 logger = logging.getLogger(__name__)
@@ -15,6 +19,46 @@ trip_api = TripAPI()
 currency_converter = CurrencyConverter()
 notification_service = NotificationService()
 
+# Upper bound on price searches in flight at once during a monitoring cycle
+MAX_CONCURRENT_SEARCHES = 10
+
+
+async def _get_lowest_price_usd(alert: PriceAlert) -> Optional[float]:
+    """
+    Search with an alert's stored parameters and return the lowest price.
+    
+    Args:
+        alert: Price alert whose search to run
+    
+    Returns:
+        Lowest price in USD, or None if nothing was found
+    """
+    search_params = alert.search_params or {}
+    
+    if alert.type == AlertType.FLIGHT:
+        results = await trip_api.search_flights(
+            from_city=search_params.get('flight_origin', ''),
+            to_city=search_params.get('flight_destination', ''),
+            depart_date=search_params.get('flight_depart_date', ''),
+            return_date=search_params.get('flight_return_date'),
+            passengers=search_params.get('passengers', 1)
+        )
+    elif alert.type == AlertType.HOTEL:
+        results = await trip_api.search_hotels(
+            city=search_params.get('hotel_city', ''),
+            checkin_date=search_params.get('hotel_checkin', ''),
+            checkout_date=search_params.get('hotel_checkout', ''),
+            rooms=search_params.get('hotel_rooms', 1),
+            guests=search_params.get('guests', 1)
+        )
+    else:
+        return None
+    
+    if not results:
+        return None
+    
+    return min(r.get('price_usd', float('inf')) for r in results)
+
 
 async def monitor_prices():
     """Monitor active price alerts and notify users of price drops."""
@@ -22,93 +66,116 @@ async def monitor_prices():
         logger.info("Price alerts disabled in settings")
         return
     
-    db = SessionLocal()
+    # One timestamp for the whole cycle, timezone-aware like the alert columns
+    now = utcnow()
+    
+    db = AsyncSessionLocal()
     try:
-        # Get all active alerts
-        active_alerts = db.query(PriceAlert).filter(
-            PriceAlert.status == AlertStatus.ACTIVE
-        ).all()
+        # Expire old alerts in one statement
+        await db.execute(
+            update(PriceAlert)
+            .where(
+                PriceAlert.status == AlertStatus.ACTIVE,
+                PriceAlert.expires_at < now
+            )
+            .values(status=AlertStatus.EXPIRED)
+        )
+        await db.commit()
+        
+        # Get all active alerts along with their users
+        active_alerts = (await db.scalars(
+            select(PriceAlert)
+            .options(joinedload(PriceAlert.user).load_only(User.language))
+            .where(PriceAlert.status == AlertStatus.ACTIVE)
+        )).all()
+        
+        logger.info("Monitoring %s active price alerts", len(active_alerts))
+        if not active_alerts:
+            return
+        
+        rate = await currency_converter.get_usd_to_etb_rate()
+        triggered_ids = []
+        notifications = []
+        
+        # Alerts watching the same search share a single API call and UPDATE
+        by_key = attrgetter("alert_key")
+        groups = [
+            (alert_key, list(group))
+            for alert_key, group in groupby(sorted(active_alerts, key=by_key), key=by_key)
+        ]
         
-        logger.info(f"Monitoring {len(active_alerts)} active price alerts")
+        # Run the searches concurrently so the cycle takes about as long as
+        # the slowest one rather than the sum of all of them
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_SEARCHES)
         
-        for alert in active_alerts:
+        async def search(alert: PriceAlert) -> Optional[float]:
+            async with semaphore:
+                return await _get_lowest_price_usd(alert)
+        
+        lowest_prices = await asyncio.gather(
+            *(search(alerts[0]) for _, alerts in groups),
+            return_exceptions=True
+        )
+        
+        for (alert_key, alerts), lowest_price_usd in zip(groups, lowest_prices):
             try:
-                # Check if alert has expired
-                if alert.expires_at and alert.expires_at < datetime.now():
-                    alert.status = AlertStatus.EXPIRED
-                    db.commit()
+                if isinstance(lowest_price_usd, Exception):
+                    raise lowest_price_usd
+                if lowest_price_usd is None:
                     continue
                 
-                # Get current price based on alert type
-                current_price = None
+                current_price = currency_converter.convert_usd_to_etb(lowest_price_usd, rate=rate)
                 
-                if alert.type == AlertType.FLIGHT:
-                    # Search for flights with stored parameters
-                    search_params = alert.search_params or {}
-                    flights = trip_api.search_flights(
-                        from_city=search_params.get('flight_origin', ''),
-                        to_city=search_params.get('flight_destination', ''),
-                        depart_date=search_params.get('flight_depart_date', ''),
-                        return_date=search_params.get('flight_return_date'),
-                        passengers=search_params.get('passengers', 1)
-                    )
-                    
-                    if flights:
-                        # Get lowest price
-                        lowest_price_usd = min(f.get('price_usd', float('inf')) for f in flights)
-                        current_price = currency_converter.convert_usd_to_etb(lowest_price_usd)
+                # Update current price
+                await db.execute(
+                    update(PriceAlert)
+                    .where(PriceAlert.alert_id.in_([alert.alert_id for alert in alerts]))
+                    .values(current_price=current_price)
+                )
                 
-                elif alert.type == AlertType.HOTEL:
-                    # Search for hotels with stored parameters
-                    search_params = alert.search_params or {}
-                    hotels = trip_api.search_hotels(
-                        city=search_params.get('hotel_city', ''),
-                        checkin_date=search_params.get('hotel_checkin', ''),
-                        checkout_date=search_params.get('hotel_checkout', ''),
-                        rooms=search_params.get('hotel_rooms', 1),
-                        guests=search_params.get('guests', 1)
-                    )
+                for alert in alerts:
+                    # Check if price is below target
+                    if current_price > alert.target_price:
+                        continue
                     
-                    if hotels:
-                        # Get lowest price
-                        lowest_price_usd = min(h.get('price_usd', float('inf')) for h in hotels)
-                        current_price = currency_converter.convert_usd_to_etb(lowest_price_usd)
-                
-                # Update current price
-                if current_price:
-                    alert.current_price = current_price
-                    db.commit()
+                    # Get user language
+                    language = alert.user.language if alert.user else "en"
                     
-                    # Check if price is below target
-                    if current_price <= alert.target_price:
-                        # Get user language
-                        user = db.query(User).filter(User.user_id == alert.user_id).first()
-                        language = user.language if user else "en"
-                        
-                        # Send notification
-                        await notification_service.send_price_alert(
-                            user_id=alert.user_id,
+                    # Queue notification
+                    notifications.append((
+                        alert.user_id,
+                        notification_service.price_alert_message(
                             item_type=alert.type.value,
                             new_price=current_price,
                             language=language
                         )
-                        
-                        # Mark alert as triggered
-                        alert.status = AlertStatus.TRIGGERED
-                        alert.triggered_at = datetime.now()
-                        db.commit()
-                        
-                        logger.info(f"Triggered price alert {alert.alert_id} for user {alert.user_id}")
+                    ))
+                    
+                    triggered_ids.append(alert.alert_id)
+                    logger.info("Triggered price alert %s for user %s", alert.alert_id, alert.user_id)
             
             except Exception as e:
-                logger.error(f"Error monitoring alert {alert.alert_id}: {e}")
+                logger.error("Error monitoring alerts for search %s: %s", alert_key, e)
                 continue
+        
+        # Notify everyone at once, then mark their alerts as triggered
+        if notifications:
+            await notification_service.send_bulk(notifications)
+        
+        if triggered_ids:
+            await db.execute(
+                update(PriceAlert)
+                .where(PriceAlert.alert_id.in_(triggered_ids))
+                .values(status=AlertStatus.TRIGGERED, triggered_at=now)
+            )
+        
+        await db.commit()
     
     except Exception as e:
-        logger.error(f"Error in price monitoring task: {e}")
+        logger.error("Error in price monitoring task: %s", e)
     
     finally:
-        db.close()
+        await db.close()
 
 
 async def run_price_monitor_loop(bot):
@@ -122,7 +189,7 @@ async def run_price_monitor_loop(bot):
             await asyncio.sleep(settings.PRICE_CHECK_INTERVAL)
         
         except Exception as e:
-            logger.error(f"Error in price monitor loop: {e}")
+            logger.error("Error in price monitor loop: %s", e)
             await asyncio.sleep(60)  # Wait 1 minute before retrying
 
 
@@ -3,35 +3,87 @@
 import logging
 import asyncio
 from datetime import datetime, timedelta
+from sqlalchemy import and_, or_, select
 
 from models import Booking, BookingType, PaymentStatus, User
 from services import NotificationService
-from config.database import SessionLocal
+from config.database import AsyncSessionLocal
 from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
 notification_service = NotificationService()
 
+# Bookings fetched per round-trip while streaming
+REMINDER_BATCH_SIZE = 100
+
+
+def _upcoming_clause(now: datetime):
+    """
+    Narrow completed bookings to those whose trip could be in the reminder window.
+    
+    Dates are stored as ISO strings in booking_data, so this compares them as
+    strings at day granularity; the exact window is still checked per booking.
+    
+    Args:
+        now: Current time
+    
+    Returns:
+        SQL filter clause
+    """
+    today = now.date()
+    departure_time = Booking.booking_data["departure_time"].as_string()
+    checkin_date = Booking.booking_data["checkin_date"].as_string()
+    
+    return or_(
+        and_(
+            Booking.type == BookingType.FLIGHT,
+            departure_time >= today.isoformat(),
+            departure_time < (today + timedelta(days=3)).isoformat()
+        ),
+        and_(
+            Booking.type == BookingType.HOTEL,
+            checkin_date.in_([
+                (today + timedelta(days=1)).isoformat(),
+                (today + timedelta(days=2)).isoformat()
+            ])
+        )
+    )
+
 
 async def send_reminders():
     """Send reminders for upcoming bookings."""
-    db = SessionLocal()
+    # One clock reading for the whole run. Flight times may carry a UTC
+    # offset while hotel dates are local, so flights compare as epoch seconds
+    now = datetime.now()
+    now_ts = now.timestamp()
+    
+    db = AsyncSessionLocal()
     try:
-        # Get all completed bookings
-        bookings = db.query(Booking).filter(
-            Booking.payment_status == PaymentStatus.COMPLETED
-        ).all()
-        
-        logger.info(f"Checking {len(bookings)} bookings for reminders")
+        # Stream just the columns reminders need, with the user's language,
+        # as plain rows in chunks so no ORM objects are built and only one
+        # chunk is held in memory at a time
+        bookings = await db.stream(
+            select(
+                Booking.booking_id,
+                Booking.user_id,
+                Booking.type,
+                Booking.booking_reference,
+                Booking.booking_data,
+                User.language
+            )
+            .join(Booking.user)
+            .where(Booking.payment_status == PaymentStatus.COMPLETED, _upcoming_clause(now))
+            .execution_options(yield_per=REMINDER_BATCH_SIZE)
+        )
         
-        for booking in bookings:
+        # Reminders are rendered while scanning and sent together afterwards
+        reminders = []
+        checked = 0
+        async for booking in bookings:
+            checked += 1
             try:
-                user = db.query(User).filter(User.user_id == booking.user_id).first()
-                if not user:
-                    continue
-                
-                language = user.language
+                language = booking.language
                 
                 if booking.type == BookingType.FLIGHT:
                     # Check flight departure time
@@ -40,22 +92,24 @@ async def send_reminders():
                     
                     if departure_str:
                         try:
-                            departure_time = datetime.fromisoformat(departure_str.replace('Z', '+00:00'))
-                            hours_until_flight = (departure_time - datetime.now()).total_seconds() / 3600
+                            departure_ts = datetime.fromisoformat(departure_str.replace('Z', '+00:00')).timestamp()
+                            hours_until_flight = (departure_ts - now_ts) / 3600
                             
                             # Send reminder if flight is in 24 hours
                             if 23 <= hours_until_flight <= 25:
-                                await notification_service.send_flight_reminder(
-                                    user_id=booking.user_id,
-                                    destination=booking_data.get('to_city', 'your destination'),
-                                    hours_before=24,
-                                    language=language
-                                )
+                                reminders.append((
+                                    booking.user_id,
+                                    notification_service.flight_reminder_message(
+                                        destination=booking_data.get('to_city', 'your destination'),
+                                        hours_before=24,
+                                        language=language
+                                    )
+                                ))
                                 
-                                logger.info(f"Sent flight reminder for booking {booking.booking_reference}")
+                                logger.info("Queued flight reminder for booking %s", booking.booking_reference)
                         
                         except (ValueError, TypeError) as e:
-                            logger.error(f"Error parsing flight time: {e}")
+                            logger.error("Error parsing flight time: %s", e)
                 
                 elif booking.type == BookingType.HOTEL:
                     # Check hotel check-in date
@@ -65,30 +119,38 @@ async def send_reminders():
                     if checkin_str:
                         try:
                             checkin_date = datetime.strptime(checkin_str, "%Y-%m-%d")
-                            days_until_checkin = (checkin_date - datetime.now()).days
+                            days_until_checkin = (checkin_date - now).days
                             
                             # Send reminder if check-in is tomorrow
                             if days_until_checkin == 1:
-                                await notification_service.send_hotel_reminder(
-                                    user_id=booking.user_id,
-                                    hotel_name=booking_data.get('hotel_name', 'your hotel'),
-                                    language=language
-                                )
+                                reminders.append((
+                                    booking.user_id,
+                                    notification_service.hotel_reminder_message(
+                                        hotel_name=booking_data.get('hotel_name', 'your hotel'),
+                                        language=language
+                                    )
+                                ))
                                 
-                                logger.info(f"Sent hotel reminder for booking {booking.booking_reference}")
+                                logger.info("Queued hotel reminder for booking %s", booking.booking_reference)
                         
                         except (ValueError, TypeError) as e:
-                            logger.error(f"Error parsing check-in date: {e}")
+                            logger.error("Error parsing check-in date: %s", e)
             
             except Exception as e:
-                logger.error(f"Error sending reminder for booking {booking.booking_id}: {e}")
+                logger.error("Error sending reminder for booking %s: %s", booking.booking_id, e)
                 continue
+        
+        logger.info("Checked %s bookings for reminders", checked)
+        
+        if reminders:
+            sent = await notification_service.send_bulk(reminders)
+            logger.info("Sent %s of %s reminders", sent, len(reminders))
     
     except Exception as e:
-        logger.error(f"Error in reminders task: {e}")
+        logger.error("Error in reminders task: %s", e)
     
     finally:
-        db.close()
+        await db.close()
 
 
 async def run_reminders_loop(bot):
@@ -102,7 +164,7 @@ async def run_reminders_loop(bot):
             await asyncio.sleep(3600)
         
         except Exception as e:
-            logger.error(f"Error in reminders loop: {e}")
+            logger.error("Error in reminders loop: %s", e)
             await asyncio.sleep(60)
 
 
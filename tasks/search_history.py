@@ -0,0 +1,86 @@
+"""Background task for persisting search history in batches."""
+
+import logging
+import asyncio
+from typing import List
+from sqlalchemy.exc import IntegrityError
+
+from models import SearchHistory
+from config.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Pending records are written when a batch fills up or the interval elapses
+BATCH_SIZE = 50
+FLUSH_INTERVAL = 5
+MAX_PENDING = 10_000
+
+_queue: asyncio.Queue = asyncio.Queue(maxsize=MAX_PENDING)
+_batch_ready = asyncio.Event()
+
+
+def enqueue_search_history(search_history: SearchHistory):
+    """
+    Queue a search history record for the background writer.
+    
+    Args:
+        search_history: Unsaved SearchHistory instance
+    """
+    try:
+        _queue.put_nowait(search_history)
+    except asyncio.QueueFull:
+        logger.warning("Search history queue is full, dropping record")
+        return
+    
+    if _queue.qsize() >= BATCH_SIZE:
+        _batch_ready.set()
+
+
+async def _write_batch(batch: List[SearchHistory]):
+    """Insert a batch of search history records in one transaction."""
+    try:
+        async with AsyncSessionLocal() as db:
+            db.add_all(batch)
+            try:
+                await db.commit()
+                return
+            except IntegrityError:
+                # One bad row (e.g. a user without a users row) fails the
+                # whole batch; retry row by row so only that row is lost
+                await db.rollback()
+            
+            saved = 0
+            for record in batch:
+                try:
+                    async with db.begin_nested():
+                        db.add(record)
+                    saved += 1
+                except IntegrityError as e:
+                    logger.warning("Dropping search history record for user %s: %s", record.user_id, e.orig)
+            await db.commit()
+            logger.info("Saved %s of %s search history records after a failed batch", saved, len(batch))
+    except Exception as e:
+        logger.error("Error saving %s search history records: %s", len(batch), e)
+
+
+async def flush_search_history():
+    """Write out any records still waiting in the queue."""
+    batch = []
+    while not _queue.empty():
+        batch.append(_queue.get_nowait())
+    
+    if batch:
+        await _write_batch(batch)
+
+
+async def run_search_history_writer():
+    """Run the search history writer in a loop."""
+    while True:
+        # Wake up when a batch is full or the interval is up
+        try:
+            await asyncio.wait_for(_batch_ready.wait(), timeout=FLUSH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        
+        _batch_ready.clear()
+        await flush_search_history()
@@ -0,0 +1,52 @@
+"""Supervision for long-running background loops."""
+
+import logging
+import asyncio
+from typing import Awaitable, Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+# Restart delay doubles after each crash, up to this many seconds
+MAX_BACKOFF = 300
+
+
+async def supervise(name: str, loop_fn: Callable[..., Awaitable[None]], *args):
+    """
+    Run a background loop forever, restarting it if it crashes.
+    
+    Args:
+        name: Loop name used in log messages
+        loop_fn: Coroutine function running the loop
+        *args: Arguments passed to loop_fn
+    """
+    attempts = 0
+    while True:
+        started = asyncio.get_running_loop().time()
+        try:
+            await loop_fn(*args)
+            logger.warning("Background task %s exited, restarting", name)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Background task %s crashed", name)
+        
+        # A loop that ran for a while before failing starts over with a short delay
+        if asyncio.get_running_loop().time() - started > MAX_BACKOFF:
+            attempts = 0
+        
+        await asyncio.sleep(min(MAX_BACKOFF, 2 ** attempts))
+        attempts += 1
+
+
+async def cancel_tasks(tasks: Iterable[asyncio.Task]):
+    """
+    Cancel background tasks and wait for them to finish.
+    
+    Args:
+        tasks: Tasks to cancel
+    """
+    tasks = list(tasks)
+    for task in tasks:
+        task.cancel()
+    
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -1,8 +1,9 @@
 """Basic tests for Trip Ethiopia Bot."""
 
 import pytest
+from datetime import datetime
 from config.settings import settings
-from utils.i18n import get_text, load_translations
+from utils.i18n import get_text, get_template, load_translations
 from utils.validators import validate_date, validate_number, validate_email
 from services.currency import CurrencyConverter
 
@@ -41,6 +42,13 @@ def test_text_formatting():
     assert "5" in text
 
 
+def test_template_lookup():
+    """Test raw templates match formatted text."""
+    template = get_template("bookings.reference", "en")
+    assert "{ref}" in template
+    assert template.format(ref="FL123") == get_text("bookings.reference", language="en", ref="FL123")
+
+
 def test_date_validation():
     """Test date validation."""
     # Valid future date
@@ -54,6 +62,19 @@ def test_date_validation():
     # Invalid date
     is_valid, _ = validate_date("2025-13-45")
     assert is_valid is False
+    
+    # Far future dates are valid, with or without zero padding
+    is_valid, date_obj = validate_date("2999-01-05")
+    assert is_valid is True
+    assert date_obj == datetime(2999, 1, 5)
+    
+    is_valid, date_obj = validate_date("2999-1-5")
+    assert is_valid is True
+    assert date_obj == datetime(2999, 1, 5)
+    
+    # Other ISO forms are not accepted
+    is_valid, _ = validate_date("29990105")
+    assert is_valid is False
 
 
 def test_number_validation():
@@ -98,6 +119,10 @@ def test_currency_converter():
     assert usd_amount > 0
     assert isinstance(usd_amount, float)
     
+    # Test batch conversion matches single conversion
+    batch = converter.convert_batch([100, 250.5], rate=55.5)
+    assert batch == [converter.convert_usd_to_etb(100, rate=55.5), converter.convert_usd_to_etb(250.5, rate=55.5)]
+    
     # Test price formatting
     formatted = converter.format_price(1234.56, "ETB")
     assert "1,234.56" in formatted
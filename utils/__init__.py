@@ -3,6 +3,7 @@
 from .i18n import get_text, set_user_language, load_translations
 from .validators import validate_date, validate_number, validate_email
 from .pdf_generator import generate_flight_ticket, generate_hotel_confirmation
+from .formatting import format_price
 
 __all__ = [
     "get_text",
@@ -13,6 +14,7 @@ __all__ = [
     "validate_email",
     "generate_flight_ticket",
     "generate_hotel_confirmation",
+    "format_price",
 ]
 
 
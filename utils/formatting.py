@@ -0,0 +1,25 @@
+"""Price formatting helpers shared by handlers and services."""
+
+# Pre-bound formatters for the currencies the bot displays, so the hot
+# path is a single dict lookup instead of a chain of string comparisons
+_PRICE_FORMATTERS = {
+    "ETB": "{:,.2f} Birr".format,
+    "USD": "${:,.2f}".format,
+}
+
+
+def format_price(amount: float, currency: str = "ETB") -> str:
+    """
+    Format price with currency symbol.
+    
+    Args:
+        amount: Price amount
+        currency: Currency code
+    
+    Returns:
+        Formatted price string
+    """
+    formatter = _PRICE_FORMATTERS.get(currency)
+    if formatter is None:
+        return f"{amount:,.2f} {currency}"
+    return formatter(amount)
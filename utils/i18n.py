@@ -1,28 +1,62 @@
 """Internationalization (i18n) utilities for multi-language support."""
 
-import json
+import orjson
 import os
-from typing import Dict, Any
+from functools import lru_cache
+from typing import Dict, Any, Optional
 from pathlib import Path
 
-# Global translations cache
+from cachetools import LRUCache
+
+# Global translations cache, filled per language on first use
 _translations: Dict[str, Dict[str, Any]] = {}
-_user_languages: Dict[int, str] = {}
+
+# Per-user language preferences; bounded, but entries don't expire since
+# set_user_language() keeps them current and get_text() reads them directly
+_user_languages: LRUCache = LRUCache(maxsize=10_000)
 
 # Path to locales directory
 LOCALES_DIR = Path(__file__).parent.parent / "locales"
 
+# Languages that have a locale file; listing the directory is enough to
+# decide fallbacks without parsing anything
+_available_languages = {locale_file.stem for locale_file in LOCALES_DIR.glob("*.json")}
+
+
+def _load_language(language: str) -> Dict[str, Any]:
+    """Read and parse one locale file."""
+    return orjson.loads((LOCALES_DIR / f"{language}.json").read_bytes())
+
+
+def _get_translations(language: str) -> Dict[str, Any]:
+    """
+    Get the translations for a language, loading its file on first use.
+    
+    Args:
+        language: Language code
+    
+    Returns:
+        Translations for the language, or English if it has no locale file
+    """
+    if language not in _available_languages:
+        language = "en"
+    
+    translations = _translations.get(language)
+    if translations is None:
+        translations = _translations[language] = _load_language(language)
+    
+    return translations
+
 
 def load_translations():
-    """Load all translation files into memory."""
-    global _translations
+    """Load (or reload) all translation files into memory."""
+    global _available_languages
     
-    for locale_file in LOCALES_DIR.glob("*.json"):
-        lang_code = locale_file.stem
-        with open(locale_file, "r", encoding="utf-8") as f:
-            _translations[lang_code] = json.load(f)
+    _available_languages = {locale_file.stem for locale_file in LOCALES_DIR.glob("*.json")}
+    for lang_code in _available_languages:
+        _translations[lang_code] = _load_language(lang_code)
     
-    print(f"Loaded translations for languages: {list(_translations.keys())}")
+    get_template.cache_clear()
 
 
 def set_user_language(user_id: int, language: str):
@@ -49,6 +83,19 @@ def get_user_language(user_id: int) -> str:
     return _user_languages.get(user_id, "en")
 
 
+def get_cached_language(user_id: int) -> Optional[str]:
+    """
+    Get the cached language preference for a user without a default.
+    
+    Args:
+        user_id: Telegram user ID
+    
+    Returns:
+        Language code, or None if the user is not cached
+    """
+    return _user_languages.get(user_id)
+
+
 def get_text(key: str, user_id: int = None, language: str = None, **kwargs) -> str:
     """
     Get translated text for a given key.
@@ -69,25 +116,45 @@ def get_text(key: str, user_id: int = None, language: str = None, **kwargs) -> s
         else:
             language = "en"
     
-    # Fallback to English if language not found
-    if language not in _translations:
-        language = "en"
+    text = get_template(key, language)
+    
+    # Format text with parameters; templates without placeholders are
+    # returned as they are
+    if kwargs and "{" in text:
+        try:
+            text = text.format(**kwargs)
+        except (KeyError, IndexError):
+            pass
+    
+    return text
+
+
+@lru_cache(maxsize=2048)
+def get_template(key: str, language: str = "en") -> str:
+    """
+    Get the unformatted translation string for a key.
     
-    # Navigate through nested keys
-    text = _translations[language]
+    Lookups are cached per (key, language), so get_text() only runs
+    ``.format()``. Resolve a template once and call ``.format()`` on it
+    per row when rendering lists, instead of calling get_text() for
+    every row.
+    
+    Args:
+        key: Translation key (e.g., 'bookings.reference')
+        language: Language code
+    
+    Returns:
+        Translation string with its format placeholders intact
+    """
+    # Navigate through nested keys, falling back to English if the
+    # language isn't available
+    text = _get_translations(language)
     for part in key.split("."):
         if isinstance(text, dict):
             text = text.get(part, key)
         else:
             return key
     
-    # Format text with parameters
-    if kwargs and isinstance(text, str):
-        try:
-            text = text.format(**kwargs)
-        except KeyError:
-            pass
-    
     return text if isinstance(text, str) else key
 
 
@@ -108,11 +175,6 @@ def get_all_text(user_id: int = None, language: str = None) -> Dict[str, Any]:
         else:
             language = "en"
     
-    return _translations.get(language, _translations.get("en", {}))
-
-
-# Initialize translations on import
-if not _translations:
-    load_translations()
+    return _get_translations(language)
 
 
@@ -8,18 +8,94 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 from io import BytesIO
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Callable, List, Optional, Tuple
+from pathlib import Path
 import os
+import tempfile
+import time
 
 from config.settings import settings
 
+# How often renders check the ticket cache for old files, in seconds
+TICKET_CACHE_PRUNE_INTERVAL = 3600
+_last_prune = 0.0
 
-def generate_flight_ticket(booking_data: Dict[str, Any]) -> BytesIO:
+# Styles don't depend on the booking, so they are built once and shared by
+# every document
+_styles = getSampleStyleSheet()
+
+TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=_styles['Heading1'],
+    fontSize=24,
+    textColor=colors.HexColor('#1a73e8'),
+    alignment=TA_CENTER,
+    spaceAfter=30
+)
+
+HEADER_STYLE = ParagraphStyle(
+    'Header',
+    parent=_styles['Heading2'],
+    fontSize=16,
+    textColor=colors.HexColor('#202124'),
+    spaceAfter=12
+)
+
+# Two-column label/value tables
+COL_WIDTHS = [2.5 * inch, 4 * inch]
+
+
+def _table_style(label_background: str) -> TableStyle:
+    """Style for a label/value table with a shaded label column."""
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor(label_background)),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('LEFTPADDING', (0, 0), (-1, -1), 12),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 12),
+        ('TOPPADDING', (0, 0), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ])
+
+
+GREY_TABLE_STYLE = _table_style('#f1f3f4')
+BLUE_TABLE_STYLE = _table_style('#e8f0fe')
+
+
+def _payment_rows(booking_data: Dict[str, Any]) -> List[List[str]]:
+    """Payment information rows shared by every booking document."""
+    # Only fall back to the current time when the booking has no date
+    booking_date = booking_data.get('booking_date') or datetime.now().strftime('%Y-%m-%d %H:%M')
+    
+    return [
+        ['Total Amount', f"{booking_data.get('total_price', 0)} {booking_data.get('currency', 'ETB')}"],
+        ['Payment Status', booking_data.get('payment_status', 'N/A')],
+        ['Payment Method', booking_data.get('payment_method', 'N/A')],
+        ['Booking Date', booking_date],
+    ]
+
+
+def _build_booking_pdf(
+    title: str,
+    reference_label: str,
+    booking_data: Dict[str, Any],
+    sections: List[Tuple[str, List[List[str]], TableStyle]],
+    notes: str
+) -> BytesIO:
     """
-    Generate flight e-ticket PDF.
+    Render a booking document: title, company block, reference, one
+    label/value table per section, then the payment table and footer.
     
     Args:
-        booking_data: Dictionary containing flight booking information
+        title: Document title
+        reference_label: Label shown before the booking reference
+        booking_data: Dictionary containing booking information
+        sections: (header, rows, table style) for each booking-specific table
+        notes: Footer lines specific to the booking type
     
     Returns:
         BytesIO object containing PDF data
@@ -27,28 +103,9 @@ def generate_flight_ticket(booking_data: Dict[str, Any]) -> BytesIO:
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4)
     story = []
-    styles = getSampleStyleSheet()
-    
-    # Custom styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#1a73e8'),
-        alignment=TA_CENTER,
-        spaceAfter=30
-    )
-    
-    header_style = ParagraphStyle(
-        'Header',
-        parent=styles['Heading2'],
-        fontSize=16,
-        textColor=colors.HexColor('#202124'),
-        spaceAfter=12
-    )
     
     # Title
-    story.append(Paragraph("✈️ FLIGHT E-TICKET", title_style))
+    story.append(Paragraph(title, TITLE_STYLE))
     story.append(Spacer(1, 0.2 * inch))
     
     # Company info
@@ -58,40 +115,56 @@ def generate_flight_ticket(booking_data: Dict[str, Any]) -> BytesIO:
     {settings.COMPANY_EMAIL} | {settings.COMPANY_PHONE}
     </para>
     """
-    story.append(Paragraph(company_info, styles['Normal']))
+    story.append(Paragraph(company_info, _styles['Normal']))
     story.append(Spacer(1, 0.3 * inch))
     
     # Booking reference
-    story.append(Paragraph(f"<b>Booking Reference:</b> {booking_data.get('booking_reference', 'N/A')}", header_style))
+    story.append(Paragraph(f"<b>{reference_label}:</b> {booking_data.get('booking_reference', 'N/A')}", HEADER_STYLE))
     story.append(Spacer(1, 0.2 * inch))
     
-    # Passenger information
+    # Booking details, then payment information
+    sections = sections + [("Payment Information", _payment_rows(booking_data), GREY_TABLE_STYLE)]
+    for index, (header, rows, table_style) in enumerate(sections):
+        table = Table(rows, colWidths=COL_WIDTHS)
+        table.setStyle(table_style)
+        
+        story.append(Paragraph(f"<b>{header}</b>", HEADER_STYLE))
+        story.append(table)
+        story.append(Spacer(1, 0.5 * inch if index == len(sections) - 1 else 0.3 * inch))
+    
+    # Footer
+    footer_text = f"""
+    <para align=center>
+    <b>Important Information:</b><br/>
+    {notes}
+    </para>
+    """
+    
+    story.append(Paragraph(footer_text, _styles['Normal']))
+    
+    # Build PDF
+    doc.build(story)
+    buffer.seek(0)
+    
+    return buffer
+
+
+def generate_flight_ticket(booking_data: Dict[str, Any]) -> BytesIO:
+    """
+    Generate flight e-ticket PDF.
+    
+    Args:
+        booking_data: Dictionary containing flight booking information
+    
+    Returns:
+        BytesIO object containing PDF data
+    """
     passenger_data = [
         ['Passenger Name', booking_data.get('passenger_name', 'N/A')],
         ['Email', booking_data.get('email', 'N/A')],
         ['Phone', booking_data.get('phone', 'N/A')],
     ]
     
-    passenger_table = Table(passenger_data, colWidths=[2.5 * inch, 4 * inch])
-    passenger_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f1f3f4')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 12),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 12),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-    ]))
-    
-    story.append(Paragraph("<b>Passenger Information</b>", header_style))
-    story.append(passenger_table)
-    story.append(Spacer(1, 0.3 * inch))
-    
-    # Flight details
     flight_data = booking_data.get('flight_data', {})
     flight_details = [
         ['From', flight_data.get('from_city', 'N/A')],
@@ -103,69 +176,20 @@ def generate_flight_ticket(booking_data: Dict[str, Any]) -> BytesIO:
         ['Class', flight_data.get('class', 'Economy')],
     ]
     
-    flight_table = Table(flight_details, colWidths=[2.5 * inch, 4 * inch])
-    flight_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e8f0fe')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 12),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 12),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-    ]))
-    
-    story.append(Paragraph("<b>Flight Details</b>", header_style))
-    story.append(flight_table)
-    story.append(Spacer(1, 0.3 * inch))
-    
-    # Payment information
-    payment_data = [
-        ['Total Amount', f"{booking_data.get('total_price', 0)} {booking_data.get('currency', 'ETB')}"],
-        ['Payment Status', booking_data.get('payment_status', 'N/A')],
-        ['Payment Method', booking_data.get('payment_method', 'N/A')],
-        ['Booking Date', booking_data.get('booking_date', datetime.now().strftime('%Y-%m-%d %H:%M'))],
-    ]
-    
-    payment_table = Table(payment_data, colWidths=[2.5 * inch, 4 * inch])
-    payment_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f1f3f4')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 12),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 12),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-    ]))
-    
-    story.append(Paragraph("<b>Payment Information</b>", header_style))
-    story.append(payment_table)
-    story.append(Spacer(1, 0.5 * inch))
-    
-    # Footer
-    footer_text = """
-    <para align=center>
-    <b>Important Information:</b><br/>
-    Please arrive at the airport at least 2 hours before departure.<br/>
+    notes = f"""Please arrive at the airport at least 2 hours before departure.<br/>
     Valid ID/Passport required for check-in.<br/>
-    For support, contact {email} or {phone}
-    </para>
-    """.format(email=settings.COMPANY_EMAIL, phone=settings.COMPANY_PHONE)
-    
-    story.append(Paragraph(footer_text, styles['Normal']))
-    
-    # Build PDF
-    doc.build(story)
-    buffer.seek(0)
-    
-    return buffer
+    For support, contact {settings.COMPANY_EMAIL} or {settings.COMPANY_PHONE}"""
+    
+    return _build_booking_pdf(
+        "✈️ FLIGHT E-TICKET",
+        "Booking Reference",
+        booking_data,
+        [
+            ("Passenger Information", passenger_data, GREY_TABLE_STYLE),
+            ("Flight Details", flight_details, BLUE_TABLE_STYLE),
+        ],
+        notes
+    )
 
 
 def generate_hotel_confirmation(booking_data: Dict[str, Any]) -> BytesIO:
@@ -178,74 +202,12 @@ def generate_hotel_confirmation(booking_data: Dict[str, Any]) -> BytesIO:
     Returns:
         BytesIO object containing PDF data
     """
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    story = []
-    styles = getSampleStyleSheet()
-    
-    # Custom styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#1a73e8'),
-        alignment=TA_CENTER,
-        spaceAfter=30
-    )
-    
-    header_style = ParagraphStyle(
-        'Header',
-        parent=styles['Heading2'],
-        fontSize=16,
-        textColor=colors.HexColor('#202124'),
-        spaceAfter=12
-    )
-    
-    # Title
-    story.append(Paragraph("🏨 HOTEL BOOKING CONFIRMATION", title_style))
-    story.append(Spacer(1, 0.2 * inch))
-    
-    # Company info
-    company_info = f"""
-    <para align=center>
-    <b>{settings.COMPANY_NAME}</b><br/>
-    {settings.COMPANY_EMAIL} | {settings.COMPANY_PHONE}
-    </para>
-    """
-    story.append(Paragraph(company_info, styles['Normal']))
-    story.append(Spacer(1, 0.3 * inch))
-    
-    # Booking reference
-    story.append(Paragraph(f"<b>Confirmation Number:</b> {booking_data.get('booking_reference', 'N/A')}", header_style))
-    story.append(Spacer(1, 0.2 * inch))
-    
-    # Guest information
     guest_data = [
         ['Guest Name', booking_data.get('guest_name', 'N/A')],
         ['Email', booking_data.get('email', 'N/A')],
         ['Phone', booking_data.get('phone', 'N/A')],
     ]
     
-    guest_table = Table(guest_data, colWidths=[2.5 * inch, 4 * inch])
-    guest_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f1f3f4')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 12),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 12),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-    ]))
-    
-    story.append(Paragraph("<b>Guest Information</b>", header_style))
-    story.append(guest_table)
-    story.append(Spacer(1, 0.3 * inch))
-    
-    # Hotel details
     hotel_data = booking_data.get('hotel_data', {})
     hotel_details = [
         ['Hotel Name', hotel_data.get('hotel_name', 'N/A')],
@@ -258,68 +220,94 @@ def generate_hotel_confirmation(booking_data: Dict[str, Any]) -> BytesIO:
         ['Number of Guests', str(hotel_data.get('guests', 1))],
     ]
     
-    hotel_table = Table(hotel_details, colWidths=[2.5 * inch, 4 * inch])
-    hotel_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e8f0fe')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 12),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 12),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-    ]))
-    
-    story.append(Paragraph("<b>Hotel Details</b>", header_style))
-    story.append(hotel_table)
-    story.append(Spacer(1, 0.3 * inch))
-    
-    # Payment information
-    payment_data = [
-        ['Total Amount', f"{booking_data.get('total_price', 0)} {booking_data.get('currency', 'ETB')}"],
-        ['Payment Status', booking_data.get('payment_status', 'N/A')],
-        ['Payment Method', booking_data.get('payment_method', 'N/A')],
-        ['Booking Date', booking_data.get('booking_date', datetime.now().strftime('%Y-%m-%d %H:%M'))],
-    ]
-    
-    payment_table = Table(payment_data, colWidths=[2.5 * inch, 4 * inch])
-    payment_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f1f3f4')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 12),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 12),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-    ]))
-    
-    story.append(Paragraph("<b>Payment Information</b>", header_style))
-    story.append(payment_table)
-    story.append(Spacer(1, 0.5 * inch))
-    
-    # Footer
-    footer_text = """
-    <para align=center>
-    <b>Important Information:</b><br/>
-    Check-in time: 2:00 PM | Check-out time: 12:00 PM<br/>
+    notes = f"""Check-in time: 2:00 PM | Check-out time: 12:00 PM<br/>
     Valid ID required at check-in.<br/>
-    For inquiries, contact {email} or {phone}
-    </para>
-    """.format(email=settings.COMPANY_EMAIL, phone=settings.COMPANY_PHONE)
-    
-    story.append(Paragraph(footer_text, styles['Normal']))
+    For inquiries, contact {settings.COMPANY_EMAIL} or {settings.COMPANY_PHONE}"""
+    
+    return _build_booking_pdf(
+        "🏨 HOTEL BOOKING CONFIRMATION",
+        "Confirmation Number",
+        booking_data,
+        [
+            ("Guest Information", guest_data, GREY_TABLE_STYLE),
+            ("Hotel Details", hotel_details, BLUE_TABLE_STYLE),
+        ],
+        notes
+    )
+
+
+def prune_ticket_cache(max_age: Optional[int] = None) -> int:
+    """
+    Delete cached tickets (and leftover temp files) not used for a while.
     
-    # Build PDF
-    doc.build(story)
-    buffer.seek(0)
+    Args:
+        max_age: Age in seconds, defaults to settings.TICKET_CACHE_MAX_AGE
     
-    return buffer
+    Returns:
+        Number of files deleted
+    """
+    if max_age is None:
+        max_age = settings.TICKET_CACHE_MAX_AGE
+    cutoff = time.time() - max_age
+    removed = 0
+    
+    for cached_file in Path(settings.TICKET_CACHE_DIR).glob("*"):
+        try:
+            if cached_file.is_file() and cached_file.stat().st_mtime < cutoff:
+                cached_file.unlink()
+                removed += 1
+        except FileNotFoundError:
+            # Removed by another render or process in the meantime
+            continue
+    
+    return removed
 
 
+def render_ticket_to_file(
+    generator: Callable[[Dict[str, Any]], BytesIO],
+    booking_data: Dict[str, Any],
+    filename: str
+) -> Path:
+    """
+    Render a ticket PDF into the ticket cache, reusing a previous render.
+    
+    Args:
+        generator: PDF generator (e.g., generate_flight_ticket)
+        booking_data: Dictionary containing booking information
+        filename: Cache file name, unique per booking and payment status
+    
+    Returns:
+        Path to the cached PDF file
+    """
+    global _last_prune
+    
+    path = Path(settings.TICKET_CACHE_DIR) / filename
+    
+    if path.exists():
+        # Mark the ticket as recently used so pruning keeps it
+        os.utime(path)
+        return path
+    
+    path.parent.mkdir(parents=True, exist_ok=True)
+    buffer = generator(booking_data)
+    
+    # Write to a uniquely named temp file first, so concurrent renders of the
+    # same ticket never share a file and views never see a partial PDF
+    with tempfile.NamedTemporaryFile(
+        dir=path.parent, prefix=f"{path.stem}.", suffix=".tmp", delete=False
+    ) as tmp_file:
+        tmp_file.write(buffer.getvalue())
+    
+    try:
+        os.replace(tmp_file.name, path)
+    except OSError:
+        os.unlink(tmp_file.name)
+        raise
+    
+    # Prune old tickets now and then, piggybacking on renders
+    now = time.time()
+    if now - _last_prune >= TICKET_CACHE_PRUNE_INTERVAL:
+        _last_prune = now
+        prune_ticket_cache()
+    
+    return path
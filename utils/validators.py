@@ -4,6 +4,10 @@ import re
 from datetime import datetime
 from typing import Optional, Tuple
 
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}\Z')
+# Ethiopian phone numbers: +251XXXXXXXXX or 0XXXXXXXXX
+PHONE_PATTERN = re.compile(r'^(\+251|0)[79]\d{8}\Z')
+
 
 def validate_date(date_str: str) -> Tuple[bool, Optional[datetime]]:
     """
@@ -16,7 +20,12 @@ def validate_date(date_str: str) -> Tuple[bool, Optional[datetime]]:
         Tuple of (is_valid, datetime_object or None)
     """
     try:
-        date_obj = datetime.strptime(date_str, "%Y-%m-%d")
+        # fromisoformat is much faster than strptime but accepts other ISO
+        # forms too, so it's only used for exact YYYY-MM-DD input
+        if len(date_str) == 10 and date_str[4] == "-" and date_str[7] == "-":
+            date_obj = datetime.fromisoformat(date_str)
+        else:
+            date_obj = datetime.strptime(date_str, "%Y-%m-%d")
         # Check if date is in the future
         if date_obj.date() < datetime.now().date():
             return False, None
@@ -58,8 +67,7 @@ def validate_email(email: str) -> bool:
     Returns:
         True if valid, False otherwise
     """
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return bool(re.match(pattern, email))
+    return EMAIL_PATTERN.match(email) is not None
 
 
 def validate_phone(phone: str) -> bool:
@@ -72,9 +80,7 @@ def validate_phone(phone: str) -> bool:
     Returns:
         True if valid, False otherwise
     """
-    # Ethiopian phone numbers: +251XXXXXXXXX or 0XXXXXXXXX
-    pattern = r'^(\+251|0)[79]\d{8}$'
-    return bool(re.match(pattern, phone.replace(" ", "").replace("-", "")))
+    return PHONE_PATTERN.match(phone.replace(" ", "").replace("-", "")) is not None
 
 
 def validate_city(city: str) -> Tuple[bool, Optional[str]]: